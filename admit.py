@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Admission control: can a task join a task set that is already scheduled?
+
+The jobs of the other tasks keep their place, repeated every (old)
+hyperperiod if the new task extends it, and only the jobs of the new task
+are fitted in by repair.repair, which moves the jobs in their way to other
+cores or times in the windows they touch, if need be. If the task replaces
+one with the same id, the jobs of the old version make room first.
+Rejection only means that no such local change was found; rescheduling the
+whole task set might still succeed."""
+
+import argparse
+import os
+import sys
+import time
+
+import dagfill
+import load
+from load import as_object, expand, hyperperiod
+from repair import repair
+from api import listed_solution, validate
+from audit import read_schedule
+
+def job_key(j, offset=0):
+    "identifies the job of a task with a release offset within the hyperperiod"
+    return (j.task.id, j.release - offset, getattr(j, 'seg_id', None))
+
+def rejected(tasks, horizon, unplaced=()):
+    "the result of admit if the task does not fit"
+    return as_object({
+        'accepted'    : False,
+        'tasks'       : tasks,
+        'hyperperiod' : horizon,
+        'jobs'        : None,
+        'placement'   : None,
+        'unplaced'    : list(unplaced),
+        'added'       : [],
+        'removed'     : [],
+        'moved'       : [],
+    })
+
+def admit(tasks, placement, task, ncores, depth=2, budget=1000):
+    """try to add task to tasks, whose jobs over the hyperperiod (as listed
+    by load.expand) run as given by placement, a list of (core, start-time)
+    tuples in job order
+
+    The result lists the tasks and jobs of the new task set and, if it was
+    accepted, their placement in the same format; the changes relative to
+    the old schedule (repeated up to the new hyperperiod) are given by
+    added and removed, lists of (job, core, start time), and moved, a list
+    of (job, (old core, old start), (new core, new start))."""
+    old_horizon = hyperperiod([t.period for t in tasks])
+    horizon = hyperperiod([old_horizon, task.period])
+    replaced = [t for t in tasks if t.id == task.id]
+    new_tasks = [task if t.id == task.id else t for t in tasks]
+    if not replaced:
+        new_tasks.append(task)
+
+    # not even worth trying
+    if sum(t.wcet / t.period for t in new_tasks) > ncores:
+        return rejected(new_tasks, horizon)
+
+    old_jobs = expand(tasks, old_horizon)
+    assert len(old_jobs) == len(placement)
+    where = dict((job_key(j), p) for j, p in zip(old_jobs, placement))
+
+    def previous(j):
+        "where j ran in the old schedule"
+        offset = j.release - j.release % old_horizon
+        core, start = where[job_key(j, offset)]
+        return (core, start + offset)
+
+    jobs = expand(new_tasks, horizon)
+    for i, j in enumerate(jobs):
+        j.id = i
+    schedule = dict((core, []) for core in range(ncores))
+    added = []
+    for j in jobs:
+        if j.task is task:
+            added.append(j)
+        else:
+            core, start = previous(j)
+            schedule[core].append((j, start))
+
+    # narrow the windows of the new jobs to what their predecessors and
+    # successors leave, so that placing one cannot rule out its relatives
+    windows = dagfill.prepare(added)
+    for j in added:
+        j.admit_window = (j.release, j.deadline)
+        j.release, j.deadline = windows[j]
+    (schedule, unplaced) = repair(schedule, added, depth, budget)
+    for j in added:
+        j.release, j.deadline = j.admit_window
+    if unplaced:
+        return rejected(new_tasks, horizon,
+                        sorted(unplaced, key=lambda j: (j.release, j.id)))
+
+    new_placement = [None] * len(jobs)
+    for core in schedule:
+        for j, start in schedule[core]:
+            new_placement[j.id] = (core, start)
+
+    removed = [(j,) + previous(j) for j in expand(replaced, horizon)]
+    moved = []
+    for j in jobs:
+        if j.task is not task and previous(j) != new_placement[j.id]:
+            moved.append((j, previous(j), new_placement[j.id]))
+
+    return as_object({
+        'accepted'    : True,
+        'tasks'       : new_tasks,
+        'hyperperiod' : horizon,
+        'jobs'        : jobs,
+        'placement'   : new_placement,
+        'unplaced'    : [],
+        'added'       : [(j,) + new_placement[j.id] for j in added],
+        'removed'     : removed,
+        'moved'       : moved,
+    })
+
+def stored_placement(fname):
+    "the (core, start-time) tuples of a *-schedule.csv file, in job order"
+    rows = read_schedule(fname)
+    rows = rows[rows[:, 0].argsort()]
+    return [(int(core), start) for (core, start) in rows[:, 1:3].tolist()]
+
+def describe(j):
+    seg = getattr(j, 'seg_id', None)
+    return 'task %d%s released at %d' % (
+        j.task.id, '' if seg is None else ' segment %d' % seg, j.release)
+
+def main():
+    opts = parse_args()
+
+    fname = opts.input_file
+    jobset = list(load.jobsets(fname))[opts.job_set_index - 1]
+    name = load.jobset_name(fname, opts.job_set_index, jobset)
+    ncores = opts.number_of_cores or load.jobset_cores(fname, jobset)
+    if ncores is None:
+        print('%s: Could not infer number of cores (specify with -m)' % fname)
+        sys.exit(2)
+    tasks = jobset.taskset.tasks
+    sched_fname = os.path.join(opts.schedules_dir, name + '-schedule.csv')
+    if not os.path.exists(sched_fname):
+        print('%s: no stored schedule %s' % (name, sched_fname))
+        sys.exit(2)
+    placement = stored_placement(sched_fname)
+
+    if opts.tasks_from:
+        candidates = list(load.tasksets(opts.tasks_from))[0].tasks
+    else:
+        if opts.period is None or opts.wcet is None:
+            print('either --tasks-from or both --period and --wcet are needed')
+            sys.exit(2)
+        candidates = [as_object({
+            'id'          : opts.task_id if opts.task_id is not None
+                            else max(t.id for t in tasks) + 1,
+            'period'      : opts.period,
+            'utilization' : opts.wcet / opts.period,
+            'wcet'        : opts.wcet,
+            'segments'    : False,
+        })]
+
+    result = None
+    for task in candidates:
+        if opts.tasks_from:
+            # tasks of another file must not replace tasks of this one
+            task.id = max(t.id for t in tasks) + 1
+        t0 = time.perf_counter()
+        result = admit(tasks, placement, task, ncores, opts.depth, opts.budget)
+        elapsed = time.perf_counter() - t0
+        print('%s: task %d (period %d, wcet %d) %s in %.1f ms.' % (
+            name, task.id, task.period, task.wcet,
+            'accepted' if result.accepted else 'rejected', elapsed * 1000))
+        if not result.accepted:
+            if result.unplaced:
+                print('    no room for %s (%d jobs left unplaced)' % (
+                    describe(result.unplaced[0]), len(result.unplaced)))
+            break
+        for (j, core, start) in result.added:
+            print('    + %s on core %d at %.2f' % (describe(j), core, start))
+        for (j, core, start) in result.removed:
+            print('    - %s from core %d at %.2f' % (describe(j), core, start))
+        for (j, (core, start), (new_core, new_start)) in result.moved:
+            print('    ~ %s from core %d at %.2f to core %d at %.2f' % (
+                describe(j), core, start, new_core, new_start))
+        tasks, placement = result.tasks, result.placement
+
+    if opts.output and result and result.accepted:
+        # validated like any other schedule before it is written
+        from schedule import show
+        allocations = listed_solution(result.jobs, result.placement)
+        validate(result.jobs, allocations)
+        counter = {}
+        for alloc in allocations:
+            counter[alloc.job.task.id] = counter.get(alloc.job.task.id, 0) + 1
+            alloc.job.job_of_task = counter[alloc.job.task.id]
+        with open(opts.output, 'w') as f:
+            show(opts, allocations, file=f)
+        print('%s: schedule stored in %s' % (name, opts.output))
+
+    if not (result and result.accepted):
+        sys.exit(1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Check whether a task can be added to a scheduled task "
+                    "set by changing its schedule locally")
+
+    parser.add_argument('input_file',
+                        metavar='INPUT',
+                        help='the task set file of the scheduled task set')
+
+    parser.add_argument('-i', '--job-set-index', default=1,
+                        action='store', type=int, metavar='ID',
+                        help='which task set of the file (default: the first)')
+
+    parser.add_argument('-m', '--number-of-cores', default=None,
+                        action='store', type=int, metavar='M',
+                        help='number of cores to assume (if not inferred from file name)')
+
+    parser.add_argument('-s', '--schedules-dir', default='./Schedules',
+                        action='store', metavar='DIR',
+                        help='where to find the *-schedule.csv file')
+
+    parser.add_argument('--period', default=None,
+                        action='store', type=int,
+                        help='period (and deadline) of the new task')
+
+    parser.add_argument('--wcet', default=None,
+                        action='store', type=int,
+                        help='execution time of the new task')
+
+    parser.add_argument('--task-id', default=None,
+                        action='store', type=int, metavar='ID',
+                        help='id of the new task; if a task with this id '
+                             'exists, it is replaced (default: a new id)')
+
+    parser.add_argument('--tasks-from', default=None,
+                        action='store', metavar='FILE',
+                        help='admit the tasks of the (first) task set in '
+                             'FILE one after the other, e.g., DAG tasks')
+
+    parser.add_argument('--depth', default=2,
+                        action='store', type=int,
+                        help='longest chain of jobs moved out of the way of '
+                             'another (default: 2)')
+
+    parser.add_argument('--budget', default=1000,
+                        action='store', type=int,
+                        help='placement attempts per new job (default: 1000)')
+
+    parser.add_argument('-o', '--output', default=None,
+                        action='store', metavar='FILE',
+                        help='write the new schedule to FILE if accepted')
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""In-process access to the heuristics and the MILP generator for job sets
+that are already in memory, e.g., from load.jobsets or load.expand; nothing
+here reads or writes files. schedule.py and mkILPs.py are command-line front
+ends to it.
+
+    import load, api
+    jobset = next(load.jobsets('TaskSets/2Cores4Tasks70.csv'))
+    result = api.schedule_jobset(jobset.jobs, 2, heuristic='feasint')
+    if result.outcome == api.Outcome.FEASIBLE:
+        print(result.placement)
+"""
+
+import dagfill
+import dagfeasint
+import portfolio
+import reducer
+from repair import repair
+from decomp import decompose_limited_preemptive, decompose_restore
+from propagate import tighten, tighten_windows, restore_windows
+from load import as_object
+from cache import job_params
+from results import Outcome
+from instrument import NO_STATS
+
+# the heuristics of schedule_jobset, besides 'portfolio', which races them
+HEURISTIC_MODULES = {
+    'backfill' : dagfill,
+    'feasint'  : dagfeasint,
+}
+
+FORMULATIONS = ['minmax', 'overlap']
+
+def allocations(mapping, start_times, finish_times):
+    return [as_object({
+        'id'    : i,
+        'core'  : mapping[i],
+        'start' : start_times[i],
+        'end'   : finish_times[i],
+    }) for i in sorted(mapping.keys())]
+
+def heuristic_solution(schedule, extra=()):
+    # convert assignments
+    mapping = {}
+    start_times = {}
+    finish_times = {}
+    for core in schedule:
+        for job, start in schedule[core]:
+            mapping[job.id] = core
+            start_times[job.id] = start
+            finish_times[job.id] = start + job.cost
+    # jobs placed without the heuristic's help
+    for (job_id, core, start, finish) in extra:
+        mapping[job_id] = core
+        start_times[job_id] = start
+        finish_times[job_id] = finish
+
+    return allocations(mapping, start_times, finish_times)
+
+def listed_solution(jobs, schedule):
+    # convert a list of (core, start-time) tuples in job order
+    mapping = {}
+    start_times = {}
+    finish_times = {}
+    for j, (core, start) in zip(jobs, schedule):
+        mapping[j.id] = core
+        start_times[j.id] = start
+        finish_times[j.id] = start + j.cost
+
+    return allocations(mapping, start_times, finish_times)
+
+def validate(all_jobs, allocations):
+    assert len(all_jobs) == len(allocations)
+    for j, alloc in zip(all_jobs, allocations):
+        assert j.id == alloc.id
+        alloc.job = j
+        j.alloc = alloc
+
+    allocated = set()
+    # check that all allocations are in the corresponding job's
+    # feasibility window and non-overlapping
+    for alloc in allocations:
+        allocated.add(alloc.job)
+        # sanity check allocations
+        assert alloc.start >= alloc.job.release
+        assert alloc.end <= alloc.job.deadline
+        assert alloc.end - alloc.start == alloc.job.cost
+        # check for overlaps
+    # on each core, in order of start times, every job must end before the
+    # next one starts
+    by_core = sorted(allocations, key=lambda a: (a.core, a.start, a.end))
+    for alloc, other_alloc in zip(by_core, by_core[1:]):
+        if other_alloc.core == alloc.core:
+            # make sure there is no overlap
+            assert alloc.end <= other_alloc.start
+    # make sure no job was missed
+    for j in all_jobs:
+        assert j in allocated
+    # make sure the schedule is DAG-compliant
+    for j in all_jobs:
+        # all predecessors must finish before this job's start
+        for p in j.predecessors:
+            assert p.alloc.end <= j.alloc.start
+    assert len(allocated) == len(all_jobs)
+
+def run_portfolio(jobs, ncores, is_dag, with_repair, tighten, limits):
+    """race the heuristics; return (name of the winner, allocations), or
+    (None, None)"""
+    def accept(placement):
+        try:
+            validate(jobs, listed_solution(jobs, placement))
+            return True
+        except AssertionError:
+            return False
+
+    # decomposition only makes sense for DAG job sets
+    variants = [v for v in portfolio.VARIANTS if is_dag or not v.decompose]
+    winner, placement = portfolio.race(jobs, ncores, variants, accept,
+                                       with_repair, tighten, **limits)
+    if winner:
+        return winner, listed_solution(jobs, placement)
+    else:
+        return None, None
+
+def scheduled(outcome, allocations=None, winner=None):
+    "the result of schedule_jobset"
+    return as_object({
+        'outcome'     : outcome,
+        'allocations' : allocations,
+        'placement'   : [(a.core, a.start) for a in allocations]
+                        if allocations else None,
+        'winner'      : winner,
+    })
+
+def schedule_jobset(jobs, ncores, heuristic='feasint', decompose=False,
+                    with_repair=False, propagate=False, reduce=False,
+                    incremental=False, max_iterations=None, time_budget=None,
+                    check=True, reuse=None, stats=NO_STATS):
+    """schedule jobs on ncores cores with one of HEURISTIC_MODULES or with
+    'portfolio', which races all of them; the flags correspond to the
+    options of schedule.py
+
+    The result has the outcome (FEASIBLE; INFEASIBLE if propagation proves
+    that the jobs cannot be scheduled; UNSOLVED otherwise) and, if
+    feasible, the allocations (one per job, in job order, validated unless
+    check is False) and placement, the same as a list of (core, start-time)
+    tuples. The ids of the jobs are set to their index in jobs. reuse, if
+    given, is a dict that keeps what the heuristics compute independently
+    of ncores for later calls with the same jobs.
+
+    The portfolio tries each heuristic with and without decomposition by
+    itself and prepares nothing across calls, so it ignores decompose and
+    reuse; it cannot be combined with reduce."""
+    for i, j in enumerate(jobs):
+        j.id = i
+    is_dag = any(j.predecessors for j in jobs)
+
+    limits = {
+        'incremental'    : incremental,
+        'max_iterations' : max_iterations,
+        'time_budget'    : time_budget,
+    }
+
+    if heuristic == 'portfolio':
+        if reduce:
+            # the variants run on whole job sets (see portfolio.run_variant)
+            raise ValueError('the portfolio cannot be combined with reduce')
+        # tries both with and without decomposition by itself
+        with stats.phase('heuristic'):
+            winner, allocs = run_portfolio(jobs, ncores, is_dag,
+                                           with_repair, propagate, limits)
+        if not winner:
+            return scheduled(Outcome.UNSOLVED)
+        stats.fields['winner'] = winner
+        if check:
+            with stats.phase('validate'):
+                validate(jobs, allocs)
+        return scheduled(Outcome.FEASIBLE, allocs, winner)
+
+    if heuristic not in HEURISTIC_MODULES:
+        raise ValueError('unknown heuristic: %s' % heuristic)
+    module = HEURISTIC_MODULES[heuristic]
+
+    decompose = decompose and is_dag
+    if decompose:
+        with stats.phase('decompose'):
+            decompose_limited_preemptive(jobs)
+
+    # the original windows (and DAG) are restored even if a step fails
+    tightened = False
+    try:
+        if propagate:
+            # after the decomposition, which expects the windows of a DAG's
+            # jobs to agree
+            with stats.phase('propagate'):
+                feasible = tighten_windows(jobs, ncores)
+            tightened = True
+            if not feasible:
+                # only the decomposed windows are infeasible
+                return scheduled(Outcome.UNSOLVED if decompose
+                                 else Outcome.INFEASIBLE)
+
+        hard, isolated = jobs, ()
+        if reduce:
+            with stats.phase('reduce'):
+                params = job_params(jobs)
+                reduction = reducer.reduce_jobs(*params)
+                # the zero-slack jobs (reduction.forced) need no pinning
+                # here: a window as long as the job leaves the heuristics no
+                # choice
+                hard = [jobs[i] for i in reduction.kept]
+                isolated = reducer.isolated_placement(reduction, params[0],
+                                                      params[2])
+            stats.count('isolated', len(isolated))
+
+        # the windows and thus the prepared data depend on the number of
+        # cores if propagated
+        prepared = None
+        if reuse is not None and not propagate:
+            if module not in reuse:
+                with stats.phase('prepare'):
+                    reuse[module] = module.prepare(hard)
+            prepared = reuse[module]
+
+        with stats.phase('heuristic'):
+            (unassigned, schedule, difficult) = module.paf_meta_heuristic(
+                hard, ncores, stats=stats, prepared=prepared, **limits)
+        stats.count('difficult', len(difficult))
+        stats.count('unassigned', len(unassigned))
+
+        if unassigned and with_repair:
+            with stats.phase('repair'):
+                (schedule, leftover) = repair(schedule, unassigned)
+            stats.count('repaired', len(unassigned) - len(leftover))
+            unassigned = leftover
+    finally:
+        if tightened:
+            restore_windows(jobs)
+        if decompose:
+            decompose_restore(jobs)
+
+    if unassigned:
+        return scheduled(Outcome.UNSOLVED)
+    allocs = heuristic_solution(schedule, isolated)
+    if check:
+        with stats.phase('validate'):
+            validate(jobs, allocs)
+    return scheduled(Outcome.FEASIBLE, allocs)
+
+def build_model(jobs, ncores, formulation='minmax', horizon=None,
+                propagate=False, reduce=False, name='RAP',
+                with_demand_constraints=False):
+    """the MILP of scheduling jobs on ncores cores, with big M ten times the
+    horizon (by default, the latest deadline); precedence constraints with
+    jobs not in jobs are ignored, so jobs may be a prefix of a job set
+
+    formulation is 'minmax' (model.make_gurobi_milp, which mkILPs.py
+    writes) or 'overlap' (milpForm.ModelTemplate, as solved by runExp.py,
+    for job sets without precedence constraints); only the former can be
+    reduced. The result has the gurobipy model (None if propagation proves
+    that the jobs cannot be scheduled, in which case the outcome is
+    INFEASIBLE), the reduction, if any, and extra, the isolated jobs that
+    the reduction left out, placed as in schedule.load_solution."""
+    if formulation not in FORMULATIONS:
+        raise ValueError('unknown formulation: %s' % formulation)
+    position = dict((id(j), k) for k, j in enumerate(jobs))
+    releases  = [j.release for j in jobs]
+    deadlines = [j.deadline for j in jobs]
+    costs     = [j.cost for j in jobs]
+    predecessors = [[position[id(p)] for p in j.predecessors if id(p) in position]
+                    for j in jobs]
+    if formulation == 'overlap' and (reduce or any(predecessors)):
+        raise ValueError('the overlap formulation supports neither precedence '
+                         'constraints nor reduction')
+    if horizon is None:
+        horizon = max(deadlines, default=0)
+
+    result = as_object({
+        'model'     : None,
+        'outcome'   : None,
+        'reduction' : None,
+        'extra'     : (),
+    })
+
+    if propagate:
+        windows = tighten(releases, deadlines, costs, predecessors, ncores)
+        if not windows:
+            result.outcome = Outcome.INFEASIBLE
+            return result
+        # any solution within the tighter windows is a solution
+        releases, deadlines = windows
+
+    ids, forced = None, ()
+    if reduce:
+        # the isolated jobs are placed when the solution is loaded
+        reduction = reducer.reduce_jobs(releases, deadlines, costs, predecessors)
+        result.reduction = reduction
+        result.extra = reducer.isolated_placement(reduction, releases, costs)
+        releases, deadlines, costs, predecessors = reducer.kept_columns(
+            reduction, releases, deadlines, costs, predecessors)
+        ids, forced = reduction.kept, reduction.forced
+
+    M = horizon * 10 # "big M" constant
+    # both need Gurobi, which is not needed for anything else here
+    if formulation == 'minmax':
+        import model
+        result.model = model.make_gurobi_milp(
+            releases, deadlines, costs, predecessors, ncores, M, name,
+            with_demand_constraints=with_demand_constraints,
+            ids=ids, forced=forced)
+    else:
+        from milpForm import ModelTemplate
+        result.model = ModelTemplate(releases, deadlines, costs,
+                                     list(range(ncores)), M).model
+        result.model.ModelName = name
+    return result
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os
+import sys
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import load
+
+# schedule files store times with two decimals
+EPSILON = 0.01
+
+def job_arrays(jobs):
+    """release, deadline and cost arrays of a job set, and its precedence
+    constraints as arrays of (predecessor, successor) indices"""
+    index = dict((id(j), i) for i, j in enumerate(jobs))
+    release  = np.array([j.release for j in jobs], dtype=float)
+    deadline = np.array([j.deadline for j in jobs], dtype=float)
+    cost     = np.array([j.cost for j in jobs], dtype=float)
+    edges = [(index[id(p)], i) for i, j in enumerate(jobs) for p in j.predecessors]
+    pred = np.array([e[0] for e in edges], dtype=int)
+    succ = np.array([e[1] for e in edges], dtype=int)
+    return release, deadline, cost, pred, succ
+
+def read_schedule(fname):
+    "a *-schedule.csv file as an array with one row per job, in file order"
+    with open(fname, 'r') as f:
+        rows = list(csv.reader(f))
+    # Job, Core, Start, End, Release, Deadline, Cost, Task, Job of Task
+    return np.array(rows[1:], dtype=float).reshape(-1, 9)
+
+def check(name, jobs, rows):
+    """check one schedule (rows as read by read_schedule) against its job
+    set; return a list of (name, kind, detail) violations"""
+    release, deadline, cost, pred, succ = job_arrays(jobs)
+    violations = []
+    def report(kind, mask, detail):
+        for i in np.flatnonzero(mask):
+            violations.append((name, kind, detail(i)))
+
+    ids = rows[:, 0].astype(int)
+    if len(ids) != len(jobs) or not np.array_equal(np.sort(ids), np.arange(len(jobs))):
+        # nothing else can be checked sensibly
+        return [(name, 'jobs', '%d rows for %d jobs, ids %s' % (
+            len(ids), len(jobs), 'mismatched' if len(ids) == len(jobs) else 'missing'))]
+
+    order = np.argsort(ids)
+    core  = rows[order, 1].astype(int)
+    start = rows[order, 2]
+    end   = rows[order, 3]
+
+    report('mismatch',
+           (np.abs(rows[order, 4] - release) > EPSILON) |
+           (np.abs(rows[order, 5] - deadline) > EPSILON) |
+           (np.abs(rows[order, 6] - cost) > EPSILON),
+           lambda i: 'job %d: schedule lists a different job' % i)
+    report('release', start < release - EPSILON,
+           lambda i: 'job %d starts at %.2f before its release at %.2f' % (i, start[i], release[i]))
+    report('deadline', end > deadline + EPSILON,
+           lambda i: 'job %d ends at %.2f after its deadline at %.2f' % (i, end[i], deadline[i]))
+    report('cost', np.abs(end - start - cost) > EPSILON,
+           lambda i: 'job %d runs for %.2f instead of %.2f' % (i, end[i] - start[i], cost[i]))
+
+    # on each core, every job must end before the next one starts
+    by_core = np.lexsort((start, core))
+    first, second = by_core[:-1], by_core[1:]
+    report('overlap',
+           (core[first] == core[second]) & (end[first] > start[second] + EPSILON),
+           lambda k: 'jobs %d and %d overlap on core %d' % (first[k], second[k], core[first[k]]))
+
+    report('precedence', end[pred] > start[succ] + EPSILON,
+           lambda k: 'job %d starts at %.2f before its predecessor %d ends at %.2f' % (
+               succ[k], start[succ[k]], pred[k], end[pred[k]]))
+
+    return violations
+
+def audit_file(args):
+    """check the stored schedules of all job sets in one task-set file;
+    return (number of schedules checked, violations)"""
+    fname, schedules_dir, db = args
+    store = None
+    if db:
+        from expstore import ExperimentStore
+        store = ExperimentStore(db)
+    checked = 0
+    violations = []
+    for index, jobset in enumerate(load.jobsets(fname), 1):
+        name = load.jobset_name(fname, index, jobset)
+        if store:
+            rows = np.array(store.schedule(name), dtype=float).reshape(-1, 9)
+            if not len(rows):
+                continue
+        else:
+            sched_name = os.path.join(schedules_dir, name + '-schedule.csv')
+            if not os.path.exists(sched_name):
+                continue
+            rows = read_schedule(sched_name)
+        checked += 1
+        violations.extend(check(name, jobset.jobs, rows))
+    if store:
+        store.close()
+    return checked, violations
+
+def main():
+    opts = parse_args()
+    work = [(f, opts.schedules_dir, opts.db) for f in opts.input_files]
+
+    checked = 0
+    violations = []
+    with ProcessPoolExecutor(max_workers=opts.parallel) as executor:
+        for n, v in executor.map(audit_file, work):
+            checked += n
+            violations.extend(v)
+
+    for (name, kind, detail) in violations:
+        print('%s: %s: %s' % (name, kind, detail))
+    kinds = Counter(kind for (_, kind, _) in violations)
+    bad = len(set(name for (name, _, _) in violations))
+    print('Checked %d schedules, %d with violations%s.' % (
+        checked, bad,
+        ''.join(', %d %s' % (kinds[k], k) for k in sorted(kinds))))
+    if violations:
+        sys.exit(1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Re-validate stored schedules against their job sets")
+
+    parser.add_argument('input_files', nargs='+',
+                        metavar='INPUT',
+                        help='the task sets the schedules were made for')
+
+    parser.add_argument('-s', '--schedules-dir', default='./Schedules',
+                        action='store', metavar='DIR',
+                        help='where to find the *-schedule.csv files')
+
+    parser.add_argument('--db', default=None,
+                        action='store', metavar='FILE',
+                        help='check the latest schedules in the experiment '
+                             'store FILE instead')
+
+    parser.add_argument('-j', '--parallel', default=None,
+                        action='store', type=int,
+                        help='number of task-set files to check concurrently '
+                             '(default: one per CPU)')
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,7 @@
+from bisect import bisect_right
+from time import perf_counter
+
+from instrument import NO_STATS
 
 def backfill_order(jobs):
     return sorted((j for j in jobs),
@@ -16,6 +20,37 @@ def conflicts(proposed_start_time, cost, already_placed):
                         (start, start + sj.cost))
                 for sj, start in already_placed))
 
+def unschedule(schedule, jobs):
+    """remove the given jobs, and all jobs competing with them (i.e., with
+    overlapping feasibility windows), from the schedule; return the removed jobs"""
+    # merge the windows into disjoint intervals for quick lookups
+    merged = []
+    for a, b in sorted(((j.release, j.deadline) for j in jobs)):
+        if merged and a <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    ends = [b for (_, b) in merged]
+    def competing(j):
+        # first merged window that ends after j's release
+        i = bisect_right(ends, j.release)
+        return i < len(merged) and merged[i][0] < j.deadline
+
+    removed = set()
+    for core in schedule:
+        kept = []
+        for sj, start in schedule[core]:
+            if sj in jobs or competing(sj):
+                removed.add(sj)
+            else:
+                kept.append((sj, start))
+        schedule[core] = kept
+    return removed
+
+def out_of_budget(iterations, started, max_iterations, time_budget):
+    return (max_iterations is not None and iterations >= max_iterations) or \
+           (time_budget is not None and perf_counter() - started > time_budget)
+
 def backfill_job(j, sched):
     # assumption: sched is a list of non-overlapping (job, start-time) tuples
     # let's look at only relevant jobs that overlap with j's feasibility window
@@ -52,27 +87,53 @@ def backfill_first_fit(jobs, schedule):
     return (unassigned, schedule)
 
 
-def paf_meta_heuristic(jobs, cores, heuristic=backfill_first_fit):
+def paf_meta_heuristic(jobs, cores, heuristic=backfill_first_fit, stats=NO_STATS,
+                       incremental=False, max_iterations=None, time_budget=None):
     difficult = set()
     regular   = set(jobs)
+    # first, create an empty schedule
+    schedule = {}
+    for core in range(cores):
+        schedule[core] = []
+    # jobs that (still) need to be placed
+    replay = set(jobs)
+    started = perf_counter()
+    iterations = 0
     give_up = False
     while not give_up:
-        # first, create an empty schedule
-        schedule = {}
-        for core in range(cores):
-            schedule[core] = []
+        start = perf_counter()
         # pre-allocate the difficult ones
-        (unassigned1, schedule) = heuristic(difficult, schedule)
+        (unassigned1, schedule) = heuristic(difficult & replay, schedule)
+        if unassigned1 and len(replay) < len(jobs):
+            # a partial replay is not conclusive, start over from scratch
+            stats.count('full_restarts')
+            for core in range(cores):
+                schedule[core] = []
+            replay = set(jobs)
+            continue
         if unassigned1:
             # can't even pre-allocate, this is getting too difficult
             give_up = True
         # now try allocating the rest
-        (unassigned2, schedule) = heuristic(regular, schedule)
+        (unassigned2, schedule) = heuristic(regular & replay, schedule)
         # see if we found anything new that's difficult
         difficult |= unassigned2
         regular   -= unassigned2
+        iterations += 1
+        stats.iteration(time=perf_counter() - start,
+                        difficult=len(difficult), unassigned=len(unassigned2))
         if not unassigned2:
             # we found a feasible schedule!
             break
+        if give_up or out_of_budget(iterations, started, max_iterations, time_budget):
+            break
+        if incremental:
+            # only the part of the schedule in the new difficult jobs' windows
+            # needs to be redone
+            replay = unschedule(schedule, difficult) | unassigned2
+        else:
+            for core in range(cores):
+                schedule[core] = []
+            replay = set(jobs)
     return (unassigned1 | unassigned2,  schedule, difficult)
 
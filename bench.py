@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+from itertools import islice
+
+import load
+import backfill
+import dagfill
+import dagfeasint
+
+try:
+    import model
+except ImportError:
+    # Gurobi is not available, skip the model-building benchmarks
+    model = None
+
+# fixed subsets of the input files; each entry is (file, first job set, count)
+WORKLOADS = {
+    'tasks' : [
+        ('TaskSets/2Cores3Tasks90.csv', 0, 10),
+        ('TaskSets/4Cores8Tasks50.csv', 1, 4),
+        ('TaskSets/4Cores8Tasks90.csv', 1, 2),
+    ],
+    'dags' : [
+        ('DAGSets/2Cores3Tasks50/Run_0.csv', 0, 1),
+        ('DAGSets/2Cores3Tasks90/Run_0.csv', 0, 1),
+        ('DAGSets/2Cores3Tasks90/Run_1.csv', 0, 1),
+        ('DAGSets/2Cores4Tasks80/Run_10.csv', 0, 1),
+        ('DAGSets/2Cores4Tasks80/Run_11.csv', 0, 1),
+    ],
+}
+
+def ncores_of(fname):
+    return int(next(re.finditer('([0-9]+)Cores', fname)).group(1))
+
+def load_workload(workload):
+    "yield (job set, number of cores) for each job set in the workload"
+    for fname, first, count in WORKLOADS[workload]:
+        for jobset in islice(load.jobsets(fname), first, first + count):
+            for i, j in enumerate(jobset.jobs):
+                j.id = i
+            yield jobset, ncores_of(fname)
+
+def heuristic_bench(paf_meta_heuristic):
+    def run(jobsets):
+        for jobset, ncores in jobsets:
+            (unassigned, _, _) = paf_meta_heuristic(jobset.jobs, ncores)
+            yield not unassigned
+    return (lambda workload: list(load_workload(workload)), run)
+
+def load_run(files):
+    for fname, first, count in files:
+        for jobset in islice(load.jobsets(fname), first, first + count):
+            yield len(jobset.jobs) > 0
+
+def model_run(jobsets):
+    for jobset, ncores in jobsets:
+        releases  = [j.release for j in jobset.jobs]
+        job_costs = [j.cost for j in jobset.jobs]
+        deadlines = [j.deadline for j in jobset.jobs]
+        predecessors = [[p.id for p in j.predecessors] for j in jobset.jobs]
+        M = jobset.taskset.hyperperiod * 10
+        model.make_gurobi_milp(releases, deadlines, job_costs, predecessors, ncores, M)
+        yield True
+
+# each benchmark is a pair of (untimed preparation, timed run)
+BENCHMARKS = {
+    'backfill'  : heuristic_bench(backfill.paf_meta_heuristic),
+    'dagfill'   : heuristic_bench(dagfill.paf_meta_heuristic),
+    'dagfeasint': heuristic_bench(dagfeasint.paf_meta_heuristic),
+    'load'      : (lambda workload: WORKLOADS[workload], load_run),
+    'model'     : (lambda workload: list(load_workload(workload)), model_run),
+}
+
+def measure(bench, workload, repeat):
+    prepare, run = bench
+    # timing runs (without tracemalloc, which slows everything down)
+    wall_time = None
+    for _ in range(repeat):
+        inputs = prepare(workload)
+        start = time.perf_counter()
+        outcomes = list(run(inputs))
+        elapsed = time.perf_counter() - start
+        wall_time = elapsed if wall_time is None else min(wall_time, elapsed)
+    # one more run to determine peak memory usage
+    inputs = prepare(workload)
+    tracemalloc.start()
+    list(run(inputs))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'wall_time'    : wall_time,
+        'peak_memory'  : peak,
+        'success_rate' : sum(outcomes) / len(outcomes),
+    }
+
+# differences below these are measurement noise, not regressions
+ABSOLUTE_SLACK = {
+    'wall_time'   : 0.05,      # seconds
+    'peak_memory' : 64 * 1024, # bytes
+}
+
+def regressions(opts, name, result, baseline):
+    if name not in baseline:
+        return []
+    base = baseline[name]
+    found = []
+    for metric in ['wall_time', 'peak_memory']:
+        if result[metric] > base[metric] * (1 + opts.threshold) and \
+           result[metric] > base[metric] + ABSOLUTE_SLACK[metric]:
+            found.append('%s: %s regressed from %s to %s' % (
+                name, metric, base[metric], result[metric]))
+    if result['success_rate'] < base['success_rate']:
+        found.append('%s: success_rate dropped from %.2f to %.2f' % (
+            name, base['success_rate'], result['success_rate']))
+    return found
+
+def main():
+    opts = parse_args()
+
+    baseline = {}
+    if os.path.exists(opts.baseline):
+        with open(opts.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = []
+    print('%-24s,%10s,%12s,%8s' % ('Configuration', 'Time', 'Peak-memory', 'Success'))
+    for bench in opts.benchmarks:
+        if bench == 'model' and model is None:
+            print('Skipping model benchmarks: gurobipy not available.', file=sys.stderr)
+            continue
+        for workload in opts.workloads:
+            name = '%s/%s' % (bench, workload)
+            result = measure(BENCHMARKS[bench], workload, opts.repeat)
+            results[name] = result
+            print('%-24s,%10.3f,%12d,%8.2f' % (name, result['wall_time'],
+                result['peak_memory'], result['success_rate']))
+            failed += regressions(opts, name, result, baseline)
+
+    if opts.update:
+        baseline.update(results)
+        with open(opts.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print('Baseline stored in %s' % opts.baseline)
+    elif failed:
+        for msg in failed:
+            print(msg, file=sys.stderr)
+        sys.exit(1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Performance benchmarks for heuristics and model building")
+
+    parser.add_argument('-b', '--benchmarks', nargs='+',
+                        default=sorted(BENCHMARKS.keys()),
+                        choices=sorted(BENCHMARKS.keys()),
+                        help='which benchmarks to run')
+
+    parser.add_argument('-w', '--workloads', nargs='+',
+                        default=sorted(WORKLOADS.keys()),
+                        choices=sorted(WORKLOADS.keys()),
+                        help='which fixed job-set subsets to run them on')
+
+    parser.add_argument('-r', '--repeat', default=5,
+                        action='store', type=int,
+                        help='number of timing runs (the fastest one counts)')
+
+    parser.add_argument('--baseline', default='bench-baseline.json',
+                        action='store', metavar='FILE',
+                        help='where the baseline measurements are stored')
+
+    parser.add_argument('-t', '--threshold', default=0.25,
+                        action='store', type=float,
+                        help='tolerated relative increase in time and memory')
+
+    parser.add_argument('-u', '--update', default=False,
+                        action='store_true',
+                        help='record the measurements as the new baseline')
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+
+from heapq import heappush, heappop
+
+from load import as_object
+from results import Outcome
+
+def normalize(x):
+    "10.0 and 10 should hash identically"
+    if isinstance(x, float) and x.is_integer():
+        return int(x)
+    return x
+
+def job_params(jobs):
+    "extract the (releases, deadlines, costs, predecessors) tuple of a job set"
+    # assumption: j.id is the index of j in jobs
+    releases  = [j.release for j in jobs]
+    deadlines = [j.deadline for j in jobs]
+    costs     = [j.cost for j in jobs]
+    predecessors = [[p.id for p in j.predecessors] for j in jobs]
+    return (releases, deadlines, costs, predecessors)
+
+def digest(*fields):
+    return hashlib.sha256(json.dumps(fields).encode('utf-8')).hexdigest()
+
+def canonical_form(releases, deadlines, costs, predecessors, ncores):
+    """Compute a hash of the job set that does not depend on the order in
+    which jobs are listed, together with the canonical order of the jobs
+    (order[k] is the index of the k-th canonical job in the input)."""
+    njobs = len(releases)
+    params = [(normalize(releases[i]), normalize(deadlines[i]), normalize(costs[i]))
+              for i in range(njobs)]
+    successors = [[] for _ in range(njobs)]
+    for i, preds in enumerate(predecessors):
+        for p in preds:
+            successors[p].append(i)
+
+    # summarize the structure below each job, bottom-up, so that
+    # otherwise identical jobs with different successors can be told apart
+    pending = [len(succs) for succs in successors]
+    ready = [i for i in range(njobs) if not pending[i]]
+    below = [None] * njobs
+    while ready:
+        i = ready.pop()
+        below[i] = digest(params[i], sorted(below[s] for s in successors[i]))
+        for p in predecessors[i]:
+            pending[p] -= 1
+            if not pending[p]:
+                ready.append(p)
+    assert all(below) # predecessors must form a DAG
+
+    # number the jobs in topological order, always picking the smallest
+    # available job; ties are between jobs that are interchangeable
+    position = [None] * njobs
+    order = []
+    queue = []
+    def key(i):
+        return (params[i], sorted(position[p] for p in predecessors[i]), below[i])
+    pending = [len(preds) for preds in predecessors]
+    for i in range(njobs):
+        if not pending[i]:
+            heappush(queue, (key(i), i))
+    while queue:
+        _, i = heappop(queue)
+        position[i] = len(order)
+        order.append(i)
+        for s in successors[i]:
+            pending[s] -= 1
+            if not pending[s]:
+                heappush(queue, (key(s), s))
+
+    rows = [key(i)[:2] for i in order]
+    return digest(ncores, rows), order
+
+
+class SolveCache(object):
+    """Content-addressed store of solve outcomes (and schedules, if known),
+    one JSON file per canonical job set."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def lookup(self, releases, deadlines, costs, predecessors, ncores):
+        key, order = canonical_form(releases, deadlines, costs, predecessors, ncores)
+        try:
+            with open(self.path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        schedule = None
+        if entry['schedule']:
+            # map back from canonical order to the caller's order
+            schedule = [None] * len(order)
+            for k, (core, start) in enumerate(entry['schedule']):
+                schedule[order[k]] = (core, start)
+        return as_object({
+            'outcome'  : Outcome[entry['outcome']],
+            'schedule' : schedule,
+        })
+
+    def store(self, releases, deadlines, costs, predecessors, ncores,
+              outcome, schedule=None):
+        "schedule, if given, is a list of (core, start-time) tuples in job order"
+        key, order = canonical_form(releases, deadlines, costs, predecessors, ncores)
+        fname = self.path(key)
+        if not schedule and os.path.exists(fname):
+            # never replace a known schedule with a bare outcome
+            return
+        entry = {
+            'outcome'  : Outcome(outcome).name,
+            'schedule' : [list(schedule[i]) for i in order] if schedule else None,
+        }
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        # write-then-rename so that concurrent readers never see partial files
+        tmp = '%s.%d.tmp' % (fname, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, fname)
@@ -1,95 +1,73 @@
 from itertools import combinations
+from time import perf_counter
 
-from backfill import overlap, conflicts
+from backfill import overlap, conflicts, unschedule, out_of_budget
+from intervals import IntervalSet
 from order import ConsiderationOrder
+from instrument import NO_STATS
 
 def init_feas(jobs, cores):
     for j in jobs:
         j.succ_count = len(j.successors)
         j.feasibility = {}
-        j.feas_cores = cores
-        j.feas_region = (j.deadline - j.cost - j.release) * cores
         for core in range(cores):
-            j.feasibility[core] = [[j.release, j.deadline - j.cost]]
-
+            j.feasibility[core] = IntervalSet(j.release, j.deadline - j.cost)
+        j.feas_cores = sum((1 for c in j.feasibility if j.feasibility[c]))
+        j.feas_region = sum((j.feasibility[c].length for c in j.feasibility))
+
+
+def shrink_feas(j, core, change, lo, hi):
+    """apply change (IntervalSet.subtract or .restrict) to j's feasible start
+    times on core, keeping feas_cores and feas_region up to date; return
+    whether anything changed"""
+    feas = j.feasibility[core]
+    if not feas:
+        return False
+    length = feas.length
+    if not change(feas, lo, hi):
+        return False
+    j.feas_region -= length - feas.length
+    # check wether we lost a core
+    if not feas:
+        j.feas_cores -= 1
+    return True
 
 def update_feas(core, scheduled_job, start_time, queue, later_jobs):
     end_time = start_time + scheduled_job.cost
 
     for j in scheduled_job.overlapping_jobs:
         if j.in_queue or j in later_jobs:
-            updated = False
-            deleted = 0
-            blocked = [start_time - j.cost, end_time]
-            for i in range(len(j.feasibility[core])):
-                region = j.feasibility[core][i - deleted]
-                a, b = region
-                if a < blocked[0] and blocked[1] < b:
-                    # falls squarely in the middle
-                    # split in two parts
-                    # update first
-                    region[1] = blocked[0]
-                    # add new for second
-                    j.feasibility[core].append([blocked[1], b])
-                    j.feas_region -= blocked[1] - blocked[0]
-                    updated = True
-                elif a <= blocked[0] and b <= blocked[1]:
-                    # possible overlap at the end
-                    b2 = min(b, blocked[0])
-                    if b2 < b:
-                        updated = True
-                        region[1] = b2
-                        j.feas_region -= b - b2
-                elif a <= blocked[1] <= b:
-                    # possible overlap at the beginning
-                    a2 = max(a, blocked[1])
-                    if a2 > a:
-                        updated = True
-                        region[0] = a2
-                        j.feas_region -= a2 - a
-                elif blocked[0] < a and b < blocked[1]:
-                    # completely covered => infeasible, remove
-                    del j.feasibility[core][i - deleted]
-                    deleted += 1
-                    j.feas_region -= b - a
-                    updated = True
-                else:
-                    # not overlapping, nothing to do
-                    pass
-            # check wether we lost a core
-            if deleted and not j.feasibility[core]:
-                j.feas_cores -= 1
-            if updated and j.in_queue:
+            # j cannot start such that it would overlap with scheduled_job
+            blocked = (start_time - j.cost, end_time)
+            if shrink_feas(j, core, IntervalSet.subtract, *blocked) and j.in_queue:
                 queue.update(j)
 
+def restrict_feas(j, lo, hi):
+    "restrict j's feasible start times to [lo, hi]; return whether anything changed"
+    updated = False
+    for core in j.feasibility:
+        updated |= shrink_feas(j, core, IntervalSet.restrict, lo, hi)
+    return updated
+
 def update_dag_constraints(j, start_time, queue, later_jobs):
     end_time = start_time + j.cost
     for p in j.predecessors:
         if p.in_queue or p in later_jobs:
             p.succ_count -= 1
-            for c in p.feasibility:
-                updated = ([a, min(b, start_time - p.cost)] for a, b in p.feasibility[c])
-                p.feasibility[c] = [[a, b] for a, b in updated if a <= b]
-            p.feas_cores = sum((1 for c in p.feasibility if p.feasibility[c]))
-            p.feas_region = sum( (sum((b - a for (a, b) in p.feasibility[c]))
-                                  for c in p.feasibility) )
+            restrict_feas(p, p.release, start_time - p.cost)
+            # the successor count changed, so always reconsider p
             if p.in_queue:
                 queue.update(p)
     for s in j.successors:
         if s.in_queue or s in later_jobs:
-            for c in s.feasibility:
-                updated = ([max(a, end_time), b] for (a, b) in s.feasibility[c])
-                s.feasibility[c] = [[a, b] for a, b in updated if a <= b]
-            s.feas_cores = sum((1 for c in s.feasibility if s.feasibility[c]))
-            s.feas_region = sum( (sum((b - a for (a, b) in s.feasibility[c]))
-                                  for c in s.feasibility) )
-            if s.in_queue:
+            if restrict_feas(s, end_time, s.deadline - s.cost) and s.in_queue:
                 queue.update(s)
 
 def latest_startpoint(job):
-    per_core = ((c, max(job.feasibility[c], key=lambda x: x[1]))
+    "(core, start time) of the latest feasible start of job, or None"
+    per_core = ((c, job.feasibility[c].latest())
                 for c in job.feasibility if job.feasibility[c])
-    return max(per_core, key=lambda x: x[1][1], default=None)
+    return max(per_core, key=lambda x: x[1], default=None)
 
 def init_overlap(jobs):
     for j in jobs:
@@ -106,12 +84,12 @@ def order_criterion(j):
     return (
         j.succ_count,
         j.feas_cores,
-        -latest_pos[1][1] if latest_pos else 0,
+        -latest_pos[1] if latest_pos else 0,
         j.feas_region,
         -j.cost,
     )
 
-def backfill_latest_fit(jobs, schedule, later_jobs=set()):
+def backfill_latest_fit(jobs, schedule, later_jobs=set(), stats=NO_STATS):
     unassigned = set()
     queue = ConsiderationOrder(order_criterion, jobs)
 
@@ -122,7 +100,7 @@ def backfill_latest_fit(jobs, schedule, later_jobs=set()):
             break
         latest_pos = latest_startpoint(j)
         if latest_pos:
-            core, (_, start_time) = latest_pos
+            core, start_time = latest_pos
             schedule[core].append((j, start_time))
             # update the feasibility windows of predecessors and successors
             update_dag_constraints(j, start_time, queue, later_jobs)
@@ -131,9 +109,26 @@ def backfill_latest_fit(jobs, schedule, later_jobs=set()):
         else:
             unassigned.add(j)
 
+    queue.report(stats)
     return (unassigned, schedule)
 
-def paf_meta_heuristic(jobs, cores, heuristic=backfill_latest_fit):
+def replay_feas(jobs, schedule):
+    # account for the already placed jobs in the feasibility windows of jobs
+    for core in schedule:
+        for sj, start_time in schedule[core]:
+            update_dag_constraints(sj, start_time, None, jobs)
+            update_feas(core, sj, start_time, None, jobs)
+
+def prepare(jobs):
+    """compute what paf_meta_heuristic needs to know about jobs regardless
+    of the number of cores (the overlap index), to be passed to it as
+    prepared"""
+    init_overlap(jobs)
+    return True
+
+def paf_meta_heuristic(jobs, cores, heuristic=backfill_latest_fit, stats=NO_STATS,
+                       incremental=False, max_iterations=None, time_budget=None,
+                       prepared=None):
     difficult = set()
     regular   = set(jobs)
     give_up = False
@@ -145,29 +140,61 @@ def paf_meta_heuristic(jobs, cores, heuristic=backfill_latest_fit):
                 regular.remove(s)
                 difficult_succs(s)
 
-    init_overlap(jobs)
-
+    if prepared is None:
+        with stats.phase('init_overlap'):
+            prepare(jobs)
+
+    # first, create an empty schedule
+    schedule = {}
+    for core in range(cores):
+        schedule[core] = []
+    # jobs that (still) need to be placed
+    replay = set(jobs)
+    started = perf_counter()
+    iterations = 0
     while not give_up:
-        # first, create an empty schedule
-        schedule = {}
-        for core in range(cores):
-            schedule[core] = []
-        init_feas(jobs, cores)
+        start = perf_counter()
+        with stats.phase('init_feas'):
+            init_feas(replay, cores)
+            replay_feas(replay, schedule)
         # pre-allocate the difficult ones
-        (unassigned1, schedule) = heuristic(difficult, schedule, regular)
+        (unassigned1, schedule) = heuristic(difficult & replay, schedule, regular & replay,
+                                            stats=stats)
+        if unassigned1 and len(replay) < len(jobs):
+            # a partial replay is not conclusive, start over from scratch
+            stats.count('full_restarts')
+            for core in range(cores):
+                schedule[core] = []
+            replay = set(jobs)
+            continue
         if unassigned1:
             # can't even pre-allocate, this is getting too difficult
             give_up = True
         # now try allocating the rest
-        (unassigned2, schedule) = heuristic(regular, schedule)
+        (unassigned2, schedule) = heuristic(regular & replay, schedule, stats=stats)
         # see if we found anything new that's difficult
+        known_difficult = set(difficult)
         difficult |= unassigned2
         regular   -= unassigned2
         # make sure we get all the successors, too, rather than discovering them slowly
         for j in unassigned2:
             difficult_succs(j)
+        iterations += 1
+        stats.iteration(time=perf_counter() - start,
+                        difficult=len(difficult), unassigned=len(unassigned2))
         if not unassigned2:
             # we found a feasible schedule!
             break
+        if give_up or out_of_budget(iterations, started, max_iterations, time_budget):
+            break
+        if incremental:
+            # only the part of the schedule in the new difficult jobs' windows
+            # needs to be redone
+            new_difficult = difficult - known_difficult
+            replay = unschedule(schedule, difficult) | new_difficult
+        else:
+            for core in range(cores):
+                schedule[core] = []
+            replay = set(jobs)
     return (unassigned1 | unassigned2,  schedule, difficult)
 
@@ -1,6 +1,9 @@
-from backfill import overlap, conflicts
+from time import perf_counter
+
+from backfill import overlap, conflicts, unschedule, out_of_budget
 
 from order import ConsiderationOrder
+from instrument import NO_STATS
 
 def backfill_order_criterion(j):
     # sort by later deadline, tie-break by later release, then by cost
@@ -38,7 +41,7 @@ def backfill_job(j, sched, queue, later_jobs):
     # nope, nothing worked
     return False
 
-def backfill_first_fit(jobs, schedule, later_jobs=set()):
+def backfill_first_fit(jobs, schedule, later_jobs=set(), stats=NO_STATS):
     unassigned = set()
     queue = ConsiderationOrder(backfill_order_criterion, jobs)
 
@@ -56,9 +59,15 @@ def backfill_first_fit(jobs, schedule, later_jobs=set()):
                     break
         if not success:
             unassigned.add(j)
+    queue.report(stats)
     return (unassigned, schedule)
 
-def prep_dag(jobs):
+def prepare(jobs):
+    """the windows of jobs reduced to account for predecessors and
+    successors, as a map from job to (release, deadline); they depend only
+    on the jobs, not on the number of cores, and can be passed to
+    paf_meta_heuristic as prepared"""
+    windows = {}
     def latest_finish(j):
         dl = j.deadline
         for s in j.successors:
@@ -71,10 +80,14 @@ def prep_dag(jobs):
             rel = max(rel, earliest_start(p) + p.cost)
         return rel
 
+    for j in jobs:
+        windows[j] = (earliest_start(j), latest_finish(j))
+    return windows
+
+def prep_dag(jobs, windows):
     # reduce feasibility window to account for successors
     for j in jobs:
-        j.dag_deadline = latest_finish(j)
-        j.dag_release  = earliest_start(j)
+        j.dag_release, j.dag_deadline = windows[j]
 
     for j in jobs:
         j.succ_count = len(j.successors)
@@ -95,7 +108,24 @@ def update_dag_constraints(alloc, queue, later_jobs):
             if s.in_queue:
                 queue.update(s)
 
-def paf_meta_heuristic(jobs, cores, heuristic=backfill_first_fit):
+def replay_dag_constraints(jobs, schedule):
+    # account for the already placed predecessors and successors of jobs
+    placed = {}
+    for core in schedule:
+        for sj, start in schedule[core]:
+            placed[sj] = start
+    for j in jobs:
+        for p in j.predecessors:
+            if p in placed:
+                j.dag_release = max(j.dag_release, placed[p] + p.cost)
+        for s in j.successors:
+            if s in placed:
+                j.dag_deadline = min(j.dag_deadline, placed[s])
+                j.succ_count -= 1
+
+def paf_meta_heuristic(jobs, cores, heuristic=backfill_first_fit, stats=NO_STATS,
+                       incremental=False, max_iterations=None, time_budget=None,
+                       prepared=None):
     difficult = set()
     regular   = set(jobs)
 
@@ -106,28 +136,62 @@ def paf_meta_heuristic(jobs, cores, heuristic=backfill_first_fit):
                 regular.remove(s)
                 difficult_succs(s)
 
+    if prepared is None:
+        with stats.phase('prep_dag'):
+            prepared = prepare(jobs)
+
+    # first, create an empty schedule
+    schedule = {}
+    for core in range(cores):
+        schedule[core] = []
+    # jobs that (still) need to be placed
+    replay = set(jobs)
+    started = perf_counter()
+    iterations = 0
     give_up = False
     while not give_up:
-        # first, create an empty schedule
-        schedule = {}
-        for core in range(cores):
-            schedule[core] = []
+        start = perf_counter()
         # prep the jobs
-        prep_dag(jobs)
+        with stats.phase('prep_dag'):
+            prep_dag(replay, prepared)
+            replay_dag_constraints(replay, schedule)
         # pre-allocate the difficult ones
-        (unassigned1, schedule) = heuristic(difficult, schedule, regular)
+        (unassigned1, schedule) = heuristic(difficult & replay, schedule, regular & replay,
+                                            stats=stats)
+        if unassigned1 and len(replay) < len(jobs):
+            # a partial replay is not conclusive, start over from scratch
+            stats.count('full_restarts')
+            for core in range(cores):
+                schedule[core] = []
+            replay = set(jobs)
+            continue
         if unassigned1:
             # can't even pre-allocate, this is getting too difficult
             give_up = True
         # now try allocating the rest
-        (unassigned2, schedule) = heuristic(regular, schedule)
+        (unassigned2, schedule) = heuristic(regular & replay, schedule, stats=stats)
         # see if we found anything new that's difficult
+        known_difficult = set(difficult)
         difficult |= unassigned2
         regular   -= unassigned2
         for j in unassigned2:
             difficult_succs(j)
+        iterations += 1
+        stats.iteration(time=perf_counter() - start,
+                        difficult=len(difficult), unassigned=len(unassigned2))
         if not unassigned2:
             # we found a feasible schedule!
             break
+        if give_up or out_of_budget(iterations, started, max_iterations, time_budget):
+            break
+        if incremental:
+            # only the part of the schedule in the new difficult jobs' windows
+            # needs to be redone
+            new_difficult = difficult - known_difficult
+            replay = unschedule(schedule, difficult) | new_difficult
+        else:
+            for core in range(cores):
+                schedule[core] = []
+            replay = set(jobs)
     return (unassigned1 | unassigned2,  schedule, difficult)
 
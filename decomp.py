@@ -1,47 +1,76 @@
-from math import ceil, floor
+def topological_order(jobs):
+    "jobs such that each job comes after all its predecessors"
+    pending = dict((j, len(j.predecessors)) for j in jobs)
+    ready = [j for j in jobs if not j.predecessors]
+    order = []
+    while ready:
+        j = ready.pop()
+        order.append(j)
+        for s in j.successors:
+            pending[s] -= 1
+            if not pending[s]:
+                ready.append(s)
+    assert len(order) == len(jobs) # precedence constraints must be acyclic
+    return order
+
+def critical_path_lengths(jobs, prior_work):
+    "for each job, the length of the critical path of its DAG"
+    length = {}
+    for j in jobs:
+        if j in length:
+            continue
+        # collect the (weakly) connected component of j
+        component = [j]
+        length[j] = None
+        for k in component:
+            for l in k.predecessors + k.successors:
+                if l not in length:
+                    length[l] = None
+                    component.append(l)
+        longest = max((prior_work[k] + k.cost for k in component))
+        for k in component:
+            length[k] = longest
+    return length
+
+def scaled_point(release, interval, work, total, integral):
+    "point in the window by which work out of total, scaled to fit, is done"
+    if integral:
+        return release + (work * interval) // total
+    return release + (work / total) * interval
 
 def decompose_limited_preemptive(jobs, integral=True):
-    "resolve precedence constraints of jobs by tweaking release/deadlines"
-
-    def preceding_linear_work(j):
-        prior_cost = 0
-        while j.predecessors:
-            assert len(j.predecessors) == 1 # assumes linear chains of jobs
-            j = j.predecessors[0]
-            prior_cost += j.cost
-        return prior_cost
-
-    def remaining_linear_work(j):
-        remaining_cost = 0
-        while j.successors:
-            assert len(j.successors) == 1 # assumes linear chains of jobs
-            j = j.successors[0]
-            remaining_cost += j.cost
-        return remaining_cost
+    """resolve precedence constraints of jobs by tweaking release/deadlines
+
+    Each DAG's window is divided in proportion to the work along its
+    critical path: a job is released once the longest chain of work before
+    it could be done, and its deadline is the release of its earliest
+    successor."""
+    # assumption: all jobs of one DAG share the same release and deadline
+
+    # prefix sums of the cost along the longest path leading to each job
+    prior_work = {}
+    for j in topological_order(jobs):
+        prior_work[j] = max((prior_work[p] + p.cost for p in j.predecessors), default=0)
+
+    total_work = critical_path_lengths(jobs, prior_work)
 
     for j in jobs:
         j.decomp_release  = j.release
         j.decomp_deadline = j.deadline
 
-        pcost = preceding_linear_work(j)
-        rcost = remaining_linear_work(j)
-
-        if pcost == 0 and rcost == 0:
+        if not j.predecessors and not j.successors:
             continue # not a DAG job
 
-        total = pcost + rcost + j.cost
-
+        total = total_work[j]
         interval = j.deadline - j.release
 
-        pre = ((pcost / total) * interval)
-        rem = ((rcost / total) * interval)
-        if integral:
-           pre = floor(pre)
-           rem = ceil(rem)
-
-        # tweak release and deadline
-        j.release  += pre
-        j.deadline -= rem
+        # tweak release and deadline, computing both the same way so that j's
+        # deadline is never after the release of any of its successors
+        done_before = prior_work[j]
+        done_after  = min((prior_work[s] for s in j.successors), default=total)
+        j.release, j.deadline = (
+            scaled_point(j.release, interval, done_before, total, integral),
+            scaled_point(j.release, interval, done_after, total, integral))
 
     # now mask DAG structure
     for j in jobs:
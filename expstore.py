@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+
+from results import Outcome, parse_config, parse_outcome
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobsets (
+    id      INTEGER PRIMARY KEY,
+    name    TEXT NOT NULL UNIQUE,
+    cores   INTEGER,
+    tasks   INTEGER,
+    util    INTEGER,
+    set_id  INTEGER,
+    jobs    INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobsets_config ON jobsets (cores, tasks, util, set_id);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id      INTEGER PRIMARY KEY,
+    tool    TEXT NOT NULL,
+    started REAL NOT NULL,
+    options TEXT
+);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    run     INTEGER NOT NULL REFERENCES runs (id),
+    jobset  INTEGER NOT NULL REFERENCES jobsets (id),
+    source  TEXT NOT NULL,
+    outcome INTEGER NOT NULL,
+    PRIMARY KEY (run, jobset, source)
+);
+CREATE INDEX IF NOT EXISTS outcomes_latest ON outcomes (jobset, source, run);
+
+CREATE TABLE IF NOT EXISTS schedules (
+    run         INTEGER NOT NULL REFERENCES runs (id),
+    jobset      INTEGER NOT NULL REFERENCES jobsets (id),
+    job         INTEGER NOT NULL,
+    core        INTEGER NOT NULL,
+    start       REAL NOT NULL,
+    end         REAL NOT NULL,
+    release     REAL,
+    deadline    REAL,
+    cost        REAL,
+    task        INTEGER,
+    job_of_task INTEGER,
+    PRIMARY KEY (run, jobset, job)
+) WITHOUT ROWID;
+'''
+
+# where an outcome came from: the MILP solver or a heuristic
+MILP      = 'milp'
+HEURISTIC = 'heuristic'
+
+NAME_PATTERN = re.compile(r'([0-9]+)Cores([0-9]+)Tasks([0-9]+)-ID([0-9]+)')
+
+def parse_name(name):
+    "(cores, tasks, util, id) of a job-set name, or Nones if it has no such shape"
+    m = NAME_PATTERN.search(name)
+    if not m:
+        return (None, None, None, None)
+    return tuple(int(x) for x in m.groups())
+
+# the latest outcome of each job set per source
+LATEST = '''
+SELECT j.name, j.cores, j.tasks, j.util, j.set_id, o.source, o.outcome
+FROM outcomes o JOIN jobsets j ON j.id = o.jobset
+WHERE o.run = (SELECT MAX(run) FROM outcomes
+               WHERE jobset = o.jobset AND source = o.source)
+'''
+
+class ExperimentStore(object):
+    """SQLite database of job sets, runs, outcomes and schedules.
+
+    Recorded results are buffered and written in one transaction per batch
+    job sets (and on flush()/close()), so that many short runs do not pay
+    for a transaction each. Several processes may write to the same store."""
+
+    def __init__(self, fname, batch=100):
+        self.fname = fname
+        self.batch = batch
+        self.db = sqlite3.connect(fname, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start_run(self, tool, **options):
+        "register a new run of tool and return its id"
+        with self.db:
+            cur = self.db.execute(
+                'INSERT INTO runs (tool, started, options) VALUES (?, ?, ?)',
+                (tool, time.time(), json.dumps(options, sort_keys=True)))
+        return cur.lastrowid
+
+    def record(self, run, name, source, outcome, jobs=None, schedule=None):
+        """record the outcome of job set name in run; schedule, if given, is a
+        list of (job, core, start, end, release, deadline, cost, task,
+        job_of_task) tuples"""
+        self.pending.append((run, name, source, Outcome(outcome), jobs, schedule))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.db:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO jobsets (name, cores, tasks, util, set_id) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(name,) + parse_name(name) for (_, name, _, _, _, _) in self.pending])
+            self.db.executemany(
+                'UPDATE jobsets SET jobs = ? WHERE name = ? AND jobs IS NULL',
+                [(jobs, name) for (_, name, _, _, jobs, _) in self.pending
+                 if jobs is not None])
+            names = sorted(set(p[1] for p in self.pending))
+            ids = {}
+            # stay below SQLite's limit on the number of query parameters
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                ids.update(self.db.execute(
+                    'SELECT name, id FROM jobsets WHERE name IN (%s)'
+                    % ','.join('?' * len(chunk)), chunk))
+            self.db.executemany(
+                'INSERT OR REPLACE INTO outcomes (run, jobset, source, outcome) '
+                'VALUES (?, ?, ?, ?)',
+                [(run, ids[name], source, int(outcome))
+                 for (run, name, source, outcome, _, _) in self.pending])
+            for (run, name, _, _, _, schedule) in self.pending:
+                if schedule:
+                    self.db.execute(
+                        'DELETE FROM schedules WHERE run = ? AND jobset = ?',
+                        (run, ids[name]))
+                    self.db.executemany(
+                        'INSERT INTO schedules VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        [(run, ids[name]) + tuple(row) for row in schedule])
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def latest_outcomes(self, source=None):
+        """yield (name, cores, tasks, util, id, source, outcome) for the most
+        recent outcome of every job set, per source"""
+        if source:
+            query = LATEST + ' AND o.source = ?'
+            args = (source,)
+        else:
+            query = LATEST
+            args = ()
+        for (name, cores, tasks, util, id, source, outcome) in self.db.execute(query, args):
+            yield (name, cores, tasks, util, id, source, Outcome(outcome))
+
+    def schedule(self, name, run=None):
+        """the rows of the most recent schedule of job set name (or the one
+        found in run), in the order of the jobs"""
+        if run is None:
+            row = self.db.execute(
+                'SELECT MAX(s.run) FROM schedules s JOIN jobsets j ON j.id = s.jobset '
+                'WHERE j.name = ?', (name,)).fetchone()
+            run = row[0]
+        return self.db.execute(
+            'SELECT job, core, start, end, release, deadline, cost, task, job_of_task '
+            'FROM schedules s JOIN jobsets j ON j.id = s.jobset '
+            'WHERE j.name = ? AND s.run = ? ORDER BY job', (name, run)).fetchall()
+
+
+def read_schedule(fname):
+    "the rows of a *-schedule.csv file written by schedule.py"
+    with open(fname, 'r') as f:
+        rows = list(csv.reader(f))
+    return [(int(job), int(core), float(start), float(end), float(release),
+             float(deadline), float(cost), int(task), int(job_of_task))
+            for (job, core, start, end, release, deadline, cost, task, job_of_task)
+            in rows[1:]]
+
+def import_files(store, fnames):
+    "record solver logs, schedules and failure markers as one run"
+    run = store.start_run('import', files=len(fnames))
+    for fname in fnames:
+        kind = parse_config(fname)[4]
+        name = os.path.basename(fname)
+        name = name[:NAME_PATTERN.search(name).end()]
+        if kind == 'log':
+            store.record(run, name, MILP, parse_outcome(fname))
+        elif kind == 'schedule':
+            schedule = read_schedule(fname)
+            store.record(run, name, HEURISTIC, Outcome.FEASIBLE,
+                         jobs=len(schedule), schedule=schedule)
+        else:
+            store.record(run, name, HEURISTIC, Outcome.UNSOLVED)
+    store.flush()
+    return run
+
+def main():
+    opts = parse_args()
+    with ExperimentStore(opts.database) as store:
+        import_files(store, opts.input_files)
+    print('Imported %d files into %s.' % (len(opts.input_files), opts.database))
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Import result files into an experiment store")
+
+    parser.add_argument('database',
+                        metavar='DB',
+                        help='the experiment store (created if missing)')
+
+    parser.add_argument('input_files', nargs='+',
+                        metavar='RESULT-FILE',
+                        help='solver logs (*.log), schedules (*-schedule.csv) '
+                             'and failure markers (*-schedule.nosol)')
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    main()
@@ -1,51 +1,33 @@
 from itertools import combinations
 
 from backfill import overlap, conflicts
+from intervals import IntervalSet
 
 def init_feas(jobs, cores):
     for j in jobs:
         j.feasibility = {}
         for core in range(cores):
-            j.feasibility[core] = [(j.release, j.deadline - j.cost)]
+            j.feasibility[core] = IntervalSet(j.release, j.deadline - j.cost)
 
 def feas_score(j):
-    total = 0
-    for core in j.feasibility:
-        for (a, b) in  j.feasibility[core]:
-            assert b >= a
-            total += b - a + 1
     feasible_cores = sum((1 for c in j.feasibility if j.feasibility[c]))
-    total_region = sum( (sum((b - a + 1 for (a, b) in j.feasibility[c]))
-                         for c in j.feasibility) )
+    # count the feasible start times (assuming integer times)
+    total_region = sum((j.feasibility[c].length + len(j.feasibility[c])
+                        for c in j.feasibility))
     return feasible_cores, total_region
 
 def update_feas(core, scheduled_job, start_time):
     end_time = start_time + scheduled_job.cost
 
     for j in scheduled_job.overlapping_jobs:
-        updated = []
-        for (a, b) in j.feasibility[core]:
-            if a <= start_time and b <= end_time:
-                # possible overlap at the end
-                updated.append((a, min(b, start_time - j.cost)))
-            elif start_time <= a and end_time <= b:
-                # possible overlap at the beginning
-                updated.append((max(a, end_time), b))
-            elif start_time <= a and b <= end_time:
-                # completely covered => infeasible, nothing to add
-                pass
-            elif a <= start_time <= end_time <= b:
-                # possible split in two intervals
-                updated.append((a, start_time - j.cost))
-                updated.append((end_time, b))
-            else:
-                assert False
-        j.feasibility[core] = [(a, b) for (a, b) in updated if a <= b]
+        # j cannot start such that it would overlap with scheduled_job
+        j.feasibility[core].subtract(start_time - j.cost, end_time)
 
 def latest_startpoint(job):
-    per_core = ((c, max(job.feasibility[c], key=lambda x: x[1]))
+    "(core, start time) of the latest feasible start of job, or None"
+    per_core = ((c, job.feasibility[c].latest())
                 for c in job.feasibility if job.feasibility[c])
-    return max(per_core, key=lambda x: x[1][1], default=None)
+    return max(per_core, key=lambda x: x[1], default=None)
 
 def init_overlap(jobs):
     for j in jobs:
@@ -62,7 +44,7 @@ def order_criterion(j):
     latest_pos = latest_startpoint(j)
     return (
         1/fcores if fcores > 0 else 1,
-        latest_pos[1][1] if latest_pos else 0,
+        latest_pos[1] if latest_pos else 0,
         1/tfeas if tfeas > 0 else 1,
         j.cost,
     )
@@ -78,7 +60,7 @@ def backfill_latest_fit(jobs, schedule):
         remaining.remove(j)
         latest_pos = latest_startpoint(j)
         if latest_pos:
-            core, (_, start_time) = latest_pos
+            core, start_time = latest_pos
             schedule[core].append((j, start_time))
             # reduce the feasibility windows of everyone else
             update_feas(core, j, start_time)
@@ -0,0 +1,80 @@
+"""Scheduling over a frame shorter than the hyperperiod.
+
+A frame F qualifies if each period either divides F or is a multiple of F.
+Tasks of the first kind are expanded over [0, F) as usual. Each task of the
+second kind gets a reservation: it is expanded as if its period (and thus
+its deadline) were F, i.e., it is scheduled once in every frame. Repeating
+the schedule of such a folded job set every F time units yields a valid
+schedule for the whole hyperperiod, in which the jobs of the long-period
+tasks use the reservation in the first frame of each of their periods (the
+others go unused). The converse does not hold: reservations cost more than
+the tasks they stand for, so if the folded job set cannot be scheduled, this
+says nothing about the original one."""
+
+from load import as_object, expand, hyperperiod
+
+def admissible(periods, frame):
+    return all(frame % p == 0 if p <= frame else p % frame == 0
+               for p in periods)
+
+def fits(task, frame):
+    "can the task be scheduled at all if it has to complete within frame?"
+    if task.segments:
+        return all(s.wcet <= frame for s in task.segments)
+    return task.wcet <= frame
+
+def folded_utilization(tasks, frame):
+    return sum(t.wcet / min(t.period, frame) for t in tasks)
+
+def frames(tasks, ncores):
+    """the frames shorter than the hyperperiod of tasks that qualify and do
+    not overload ncores cores with reservations, from shortest to longest"""
+    periods = sorted(set(t.period for t in tasks))
+    full = hyperperiod(periods)
+    # any frame that qualifies is the hyperperiod of the periods it covers
+    candidates = sorted(set(hyperperiod(periods[:k]) for k in range(1, len(periods) + 1)))
+    for frame in candidates:
+        if frame < full and admissible(periods, frame) and \
+           all(fits(t, frame) for t in tasks if t.period > frame) and \
+           folded_utilization(tasks, frame) <= ncores:
+            yield frame
+
+def reservation(task, frame):
+    "a copy of task that runs once per frame"
+    copy = as_object(dict(task.__dict__))
+    copy.period = frame
+    copy.original = task
+    return copy
+
+def fold(jobset, frame):
+    """the jobs of jobset folded into frame, together with a map from each
+    job of jobset to (index of its folded job, offset of its frame)"""
+    tasks = [t if t.period <= frame else reservation(t, frame)
+             for t in jobset.taskset.tasks]
+    jobs = expand(tasks, frame)
+    for j in jobs:
+        # report results under the original task
+        j.task = getattr(j.task, 'original', j.task)
+
+    def key(job, release):
+        return (id(job.task), release, getattr(job, 'seg_id', None))
+    index = dict((key(j, j.release), i) for i, j in enumerate(jobs))
+    mapping = []
+    for j in jobset.jobs:
+        if j.task.period <= frame:
+            offset = j.release - j.release % frame
+        else:
+            offset = j.release
+        mapping.append((index[key(j, j.release - offset)], offset))
+
+    return as_object({
+        'frame'   : frame,
+        'jobs'    : jobs,
+        'mapping' : mapping,
+    })
+
+def unfold(folded, placement):
+    """turn a list of (core, start-time) tuples for the folded jobs into one
+    for the jobs of the original job set, both in job order"""
+    return [(placement[i][0], placement[i][1] + offset)
+            for (i, offset) in folded.mapping]
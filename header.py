@@ -103,7 +103,8 @@ def gcd(a,b):
     
 def lcm(a, b):
     """Compute the lowest common multiple of a and b"""
-    return a * b / gcd(a, b)
+    # integer division keeps the hyperperiod exact for integer periods
+    return a * b // gcd(a, b)
 
 
 def processor_init(processor):
@@ -0,0 +1,84 @@
+import json
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+class PhaseStats(object):
+    "wall-clock time per phase, counters, and per-iteration records of one run"
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self.times = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.iterations = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def add_time(self, name, seconds):
+        self.times[name] += seconds
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def maximum(self, name, value):
+        "counter that keeps the largest value seen"
+        self.counters[name] = max(self.counters[name], value)
+
+    def iteration(self, **record):
+        self.counters['iterations'] += 1
+        self.iterations.append(record)
+
+    def as_dict(self):
+        record = dict(self.fields)
+        record['times'] = dict(self.times)
+        record['counters'] = dict(self.counters)
+        record['iterations'] = self.iterations
+        return record
+
+    def write(self, f):
+        "append this run as a single JSON line"
+        print(json.dumps(self.as_dict()), file=f, flush=True)
+
+
+class NoStats(object):
+    "stand-in that records nothing, for when instrumentation is off"
+
+    def __init__(self):
+        # written to, but never read
+        self.fields = {}
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def maximum(self, name, value):
+        pass
+
+    def iteration(self, **record):
+        pass
+
+NO_STATS = NoStats()
+
+def timed(iterable):
+    "yield (item, seconds spent producing it) for each item"
+    it = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        yield item, time.perf_counter() - start
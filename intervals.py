@@ -0,0 +1,75 @@
+from bisect import bisect_left, bisect_right
+
+class IntervalSet(object):
+    """A set of disjoint closed intervals [a, b], kept sorted in two parallel
+    arrays of start and end points, with the total length (sum of b - a)
+    tracked as the set shrinks."""
+
+    __slots__ = ('starts', 'ends', 'length')
+
+    def __init__(self, a, b):
+        if a <= b:
+            self.starts = [a]
+            self.ends = [b]
+            self.length = b - a
+        else:
+            self.starts = []
+            self.ends = []
+            self.length = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __repr__(self):
+        return 'IntervalSet(%s)' % list(self)
+
+    def latest(self):
+        "the largest point in the set, or None if it is empty"
+        return self.ends[-1] if self.ends else None
+
+    def _replace(self, i, k, starts, ends):
+        removed = sum(self.ends[i:k]) - sum(self.starts[i:k])
+        added = sum(ends) - sum(starts)
+        self.starts[i:k] = starts
+        self.ends[i:k] = ends
+        self.length -= removed - added
+
+    def subtract(self, lo, hi):
+        """remove the open interval (lo, hi) from the set; return whether
+        anything changed"""
+        # intervals i..k-1 are the ones that reach into (lo, hi)
+        i = bisect_right(self.ends, lo)
+        k = bisect_left(self.starts, hi)
+        if i >= k:
+            return False
+        starts, ends = [], []
+        if self.starts[i] <= lo:
+            starts.append(self.starts[i])
+            ends.append(lo)
+        if self.ends[k - 1] >= hi:
+            starts.append(hi)
+            ends.append(self.ends[k - 1])
+        self._replace(i, k, starts, ends)
+        return True
+
+    def restrict(self, lo, hi):
+        """intersect the set with the closed interval [lo, hi]; return
+        whether anything changed"""
+        n = len(self.starts)
+        # intervals i..k-1 are the ones that overlap [lo, hi]
+        i = bisect_left(self.ends, lo)
+        k = bisect_right(self.starts, hi)
+        if i >= k:
+            changed = n > 0
+            self._replace(0, n, [], [])
+            return changed
+        first, last = max(self.starts[i], lo), min(self.ends[k - 1], hi)
+        if i == 0 and k == n and first == self.starts[0] and last == self.ends[-1]:
+            return False
+        starts, ends = self.starts[i:k], self.ends[i:k]
+        starts[0], ends[-1] = first, last
+        self._replace(0, n, starts, ends)
+        return True
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 import csv
+import os
 import ast
+import re
 
 from itertools import chain
 
@@ -30,9 +32,34 @@ class as_object(object):
     def __repr__(self):
         return "as_object(%s)" % repr(self.__dict__)
 
+TUPLE = re.compile(r'\(([^()]*)\)')
+
+def literal(field):
+    "ast.literal_eval for the numbers and booleans found in task-set files"
+    try:
+        return int(field)
+    except ValueError:
+        pass
+    try:
+        return float(field)
+    except ValueError:
+        return ast.literal_eval(field)
+
+def task_list(field):
+    "parse a list of (id, period, util, wcet) tuples"
+    field = field.strip()
+    if not (field.startswith('[') and field.endswith(']')):
+        return ast.literal_eval(field)
+    try:
+        return [tuple(literal(x) for x in t.split(','))
+                for t in TUPLE.findall(field)]
+    except (ValueError, SyntaxError):
+        # something more exotic, let Python figure it out
+        return ast.literal_eval(field)
+
 def tasksets_orig(rows):
     for row in rows:
-        row = [ast.literal_eval(field) for field in row]
+        row = [task_list(row[0])] + [literal(field) for field in row[1:]]
         yield as_object({
             'tasks'       : [as_object({
                 'id'          : id,
@@ -74,7 +101,13 @@ def taskset_dag(rows):
     })
 
 
+# task-set files with this suffix are columnar stores (see taskstore.py)
+STORE_SUFFIX = '.tstore'
+
 def tasksets(fname):
+    if fname.endswith(STORE_SUFFIX):
+        from taskstore import TaskStore
+        return TaskStore(fname).tasksets()
     with open(fname, 'r') as f:
         rows = list(csv.reader(f, delimiter=','))
         if rows[0][0] == 'T':
@@ -84,6 +117,31 @@ def tasksets(fname):
             # must be a non-DAG task set
             return tasksets_orig(rows)
 
+def jobset_name(fname, index, jobset=None):
+    """the name under which results for the index-th (from 1) job set of
+    fname are stored; job sets from a store keep the name they had in their
+    source file"""
+    stored = getattr(jobset.taskset, 'name', None) if jobset is not None else None
+    if stored:
+        return stored
+    bname = os.path.basename(fname)
+    if bname.startswith('Run'):
+        return os.path.basename(fname.replace('/Run_', '-ID')).replace('.csv', '')
+    else:
+        return bname.replace('.csv', '').replace(STORE_SUFFIX, '') + ('-ID%03d' % index)
+
+CORES_PATTERN = re.compile('([0-9]+)Cores')
+
+def cores_of(fname):
+    "the number of cores in the path of a task-set file, or None"
+    m = CORES_PATTERN.search(fname)
+    return int(m.group(1)) if m else None
+
+def jobset_cores(fname, jobset):
+    """the number of cores a job set of fname is meant for: as stored (for
+    job sets from a store), or else as in the path of fname, or None"""
+    return getattr(jobset.taskset, 'cores', None) or cores_of(fname)
+
 def jobs(task, horizon):
     for rel in range(0, horizon, task.period):
         if task.segments:
@@ -113,13 +171,16 @@ def jobs(task, horizon):
                 'successors' : [],
             })
 
+def expand(tasks, horizon):
+    "all jobs of tasks released before horizon, by release time"
+    return sorted(chain.from_iterable((jobs(t, horizon) for t in tasks)),
+                  key=lambda job: job.release)
+
 def jobsets(fname):
     for ts in tasksets(fname):
         periods = [t.period for t in ts.tasks]
         ts.hyperperiod = hyperperiod(periods)
-        jobset = sorted(chain.from_iterable((jobs(t, ts.hyperperiod)
-                                             for t in ts.tasks)),
-                        key=lambda job: job.release)
+        jobset = expand(ts.tasks, ts.hyperperiod)
         yield as_object({
             'taskset' : ts,
             'jobs'    : jobset,
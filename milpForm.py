@@ -1,6 +1,8 @@
 from gurobipy import *
-from itertools import combinations
 from itertools import permutations
+from collections import OrderedDict
+
+from results import Outcome
 
 
 '''gurobi status codes
@@ -23,54 +25,165 @@ USER_OBJ_LIMIT	15	User specified an objective limit (a bound on either the best
 '''
 
 
-def runModel(jobs, releaseTimes, deadlines, executionTimes, processors, M):
-	#declare and init model
-	m = Model('RAP')
-
-	#decision variables
-	x = m.addVars(len(jobs), len(processors), vtype=GRB.BINARY, name = "assign")
-	s = m.addVars(len(jobs), name = "startTime")
-	theta = m.addVars(len(jobs), len(jobs), vtype=GRB.BINARY, name = "overlap")
-
-	#constraints
-	assignment = m.addConstrs(((x.sum(j,'*')) == 1 for j in range(len(jobs))),'jobassign')
-	starting = m.addConstrs((s[i] >= releaseTimes[i] for i in range(len(jobs))),'jobstart')
-	deadline = m.addConstrs((s[i] + executionTimes[i]*x.sum(i,'*') <= deadlines[i] for i in range(len(jobs))),'jobdeadline')
-
-	#jobs must not ovrlap on the same processor
-	overlapping1 = m.addConstrs((
-		x[i,k] + x[j,k] + theta[i,j] + theta[j,i] <= 3
-		for (l,m) in combinations([job for job in range(len(jobs))], 2)
-		for (i,j) in permutations([l,m])
-		for k in range(len(processors))
-		if i != j
-		), 'joboverlap')
-
-	overlapping2 = m.addConstrs((s[i] - s[j] - executionTimes[j]*x.sum(j,'*') >= -M*theta[j,i]
-		for (l,m) in combinations([job for job in range(len(jobs))], 2)
-		for (i,j) in permutations([l,m])
-		if i != j
-		), 'joboverlap2')
-
-	overlapping3 = m.addConstrs((s[i] - s[j] - executionTimes[j]*x.sum(j,'*') <= M*(1-theta[j,i])
-		for (l,m) in combinations([job for job in range(len(jobs))], 2)
-		for (i,j) in permutations([l,m])
-		if i != j
-		), 'joboverlap3')
-
-
-
-	#assume no objective function
-
-	#save model
-	#m.write('Sched.lp')
-
-	m.optimize()
-	return m.status
-
-def runExperiment(jobs, releaseTimes, deadlines, executionTimes, processors, M):
+def overlappingPairs(releaseTimes, deadlines):
+	'''pairs of jobs (i, j), i < j, whose feasibility windows intersect; no
+	other pair can overlap in any schedule'''
+	order = sorted(range(len(releaseTimes)), key=lambda i: releaseTimes[i])
+	pairs = []
+	for a in range(len(order)):
+		i = order[a]
+		for b in range(a + 1, len(order)):
+			j = order[b]
+			#all remaining jobs are released after i's deadline
+			if releaseTimes[j] >= deadlines[i]:
+				break
+			pairs.append((min(i, j), max(i, j)))
+	return pairs
+
+class ModelTemplate:
+	'''the model of runModel for one job structure (release times, deadlines,
+	cores and M, i.e., one period signature); the execution times only appear
+	as coefficients, so the model can be reused for other task sets with the
+	same periods by updating them in place'''
+
+	def __init__(self, releaseTimes, deadlines, executionTimes, processors, M, threads=None, env=None):
+		njobs = len(releaseTimes)
+		ncores = len(processors)
+		self.njobs = njobs
+		self.ncores = ncores
+		self.executionTimes = list(executionTimes)
+
+		#declare and init model
+		m = Model('RAP', env=env) if env else Model('RAP')
+		if threads:
+			m.Params.Threads = threads
+
+		#only jobs with intersecting windows need to be kept apart
+		pairs = [(i, j) for (l, n) in overlappingPairs(releaseTimes, deadlines)
+			for (i, j) in permutations([l, n])]
+
+		#decision variables
+		x = m.addVars(njobs, ncores, vtype=GRB.BINARY, name = "assign")
+		s = m.addVars(njobs, name = "startTime")
+		theta = m.addVars(pairs, vtype=GRB.BINARY, name = "overlap")
+
+		#constraints
+		assignment = m.addConstrs(((x.sum(j,'*')) == 1 for j in range(njobs)),'jobassign')
+		starting = m.addConstrs((s[i] >= releaseTimes[i] for i in range(njobs)),'jobstart')
+		deadline = m.addConstrs((s[i] + executionTimes[i]*x.sum(i,'*') <= deadlines[i] for i in range(njobs)),'jobdeadline')
+
+		#jobs must not ovrlap on the same processor
+		overlapping1 = m.addConstrs((
+			x[i,k] + x[j,k] + theta[i,j] + theta[j,i] <= 3
+			for (i,j) in pairs
+			for k in range(ncores)
+			), 'joboverlap')
+
+		overlapping2 = m.addConstrs((s[i] - s[j] - executionTimes[j]*x.sum(j,'*') >= -M*theta[j,i]
+			for (i,j) in pairs
+			), 'joboverlap2')
+
+		overlapping3 = m.addConstrs((s[i] - s[j] - executionTimes[j]*x.sum(j,'*') <= M*(1-theta[j,i])
+			for (i,j) in pairs
+			), 'joboverlap3')
+
+		#assume no objective function
+
+		#save model
+		#m.write('Sched.lp')
+
+		self.model = m
+		self.x = x
+		self.s = s
+		self.pairs = pairs
+		self.deadline = deadline
+		self.overlapping2 = overlapping2
+		self.overlapping3 = overlapping3
+
+	def update(self, executionTimes):
+		'''replace the execution times (the coefficients of the assignment
+		variables in the deadline and ordering constraints)'''
+		m, x = self.model, self.x
+		changed = [i for i in range(self.njobs) if executionTimes[i] != self.executionTimes[i]]
+		for i in changed:
+			for k in range(self.ncores):
+				m.chgCoeff(self.deadline[i], x[i,k], executionTimes[i])
+		changed = set(changed)
+		for (i,j) in self.pairs:
+			if j in changed:
+				for k in range(self.ncores):
+					#the term is subtracted on the left-hand side
+					m.chgCoeff(self.overlapping2[i,j], x[j,k], -executionTimes[j])
+					m.chgCoeff(self.overlapping3[i,j], x[j,k], -executionTimes[j])
+		self.executionTimes = list(executionTimes)
+		#start from scratch, as if the model had just been built
+		m.reset()
+
+	def solve(self):
+		m = self.model
+		m.optimize()
+
+		#read back the schedule, if any
+		schedule = None
+		if m.status == GRB.OPTIMAL:
+			schedule = [(next(k for k in range(self.ncores) if self.x[i,k].X > 0.5), self.s[i].X)
+				for i in range(self.njobs)]
+		return m.status, schedule
+
+class ModelTemplates:
+	'''the most recently used ModelTemplates, by job structure'''
+
+	def __init__(self, maxsize=16, threads=None, env=None):
+		self.maxsize = maxsize
+		self.threads = threads
+		self.env = env
+		self.templates = OrderedDict()
+
+	def get(self, releaseTimes, deadlines, executionTimes, processors, M):
+		key = (tuple(releaseTimes), tuple(deadlines), len(processors), M)
+		if key in self.templates:
+			self.templates.move_to_end(key)
+			template = self.templates[key]
+			template.update(executionTimes)
+			return template
+		template = ModelTemplate(releaseTimes, deadlines, executionTimes, processors, M,
+			self.threads, self.env)
+		self.templates[key] = template
+		if len(self.templates) > self.maxsize:
+			_, oldest = self.templates.popitem(last=False)
+			oldest.model.dispose()
+		return template
+
+	def dispose(self):
+		for template in self.templates.values():
+			template.model.dispose()
+		self.templates.clear()
+
+def runModel(jobs, releaseTimes, deadlines, executionTimes, processors, M, threads=None, env=None,
+		templates=None):
+	if templates is not None:
+		template = templates.get(releaseTimes, deadlines, executionTimes, processors, M)
+	else:
+		template = ModelTemplate(releaseTimes, deadlines, executionTimes, processors, M, threads, env)
+	return template.solve()
+
+def runExperiment(jobs, releaseTimes, deadlines, executionTimes, processors, M, cache=None,
+		threads=None, env=None, templates=None):
+	#independent jobs only, so there are no predecessors to account for
+	params = (releaseTimes, deadlines, executionTimes, [[] for job in jobs], len(processors))
+	if cache:
+		known = cache.lookup(*params)
+		if known and known.outcome == Outcome.FEASIBLE:
+			return GRB.OPTIMAL
+		elif known and known.outcome == Outcome.INFEASIBLE:
+			return GRB.INFEASIBLE
 	try:
-		status = runModel(jobs, releaseTimes, deadlines, executionTimes, processors, M)
+		status, schedule = runModel(jobs, releaseTimes, deadlines, executionTimes, processors, M,
+			threads, env, templates)
+		if cache and status == GRB.OPTIMAL:
+			cache.store(*params, Outcome.FEASIBLE, schedule)
+		elif cache and status == GRB.INFEASIBLE:
+			cache.store(*params, Outcome.INFEASIBLE)
 		return status
 	except gurobipy.GurobiError as e:
 		return 'Error code ' + str(e.errno) + ': ' + str(e)
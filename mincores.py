@@ -0,0 +1,79 @@
+from heapq import heappush, heappop
+
+import numpy as np
+
+from propagate import topological_order
+
+def demand_bound(releases, deadlines, costs):
+    """the fewest cores that can do all the work that must be done within
+    any interval from a release to a deadline"""
+    releases  = np.asarray(releases)
+    deadlines = np.asarray(deadlines)
+    costs     = np.asarray(costs)
+    points = np.unique(releases)
+    at = np.searchsorted(points, releases, side='right') - 1
+    bound = 1
+    for b in np.unique(deadlines):
+        inside = deadlines <= b
+        # energy[k]: total cost of jobs within [points[k], b]
+        energy = np.cumsum(np.bincount(at[inside], weights=costs[inside],
+                                       minlength=len(points))[::-1])[::-1]
+        before = points < b
+        if before.any():
+            ratio = energy[before] / (b - points[before])
+            bound = max(bound, int(np.ceil(ratio.max() - 1e-9)))
+    return bound
+
+def asap_placement(releases, deadlines, costs, predecessors):
+    """start every job as soon as its release and predecessors allow and give
+    it a core that is free by then; return (number of cores used, list of
+    (core, start-time) tuples in job order), or None if some job misses its
+    deadline even so, in which case no number of cores suffices"""
+    starts = list(releases)
+    for j in topological_order(predecessors):
+        for p in predecessors[j]:
+            starts[j] = max(starts[j], starts[p] + costs[p])
+        if starts[j] + costs[j] > deadlines[j]:
+            return None
+    # interval partitioning: reuse the core that became free first
+    free = []
+    placement = [None] * len(starts)
+    ncores = 0
+    for j in sorted(range(len(starts)), key=lambda j: starts[j]):
+        if free and free[0][0] <= starts[j]:
+            _, core = heappop(free)
+        else:
+            core = ncores
+            ncores += 1
+        placement[j] = (core, starts[j])
+        heappush(free, (starts[j] + costs[j], core))
+    return ncores, placement
+
+def search(probe, lower, upper):
+    """the smallest m in [lower, upper) for which probe(m) returns a result,
+    assuming more cores never hurt, as (m, result), or (None, None) if there
+    is none; the core counts are probed by galloping up from lower, then by
+    bisection"""
+    failed = lower - 1
+    found, result = None, None
+    step = 1
+    while found is None:
+        m = min(failed + step, upper - 1)
+        if m <= failed:
+            # everything below upper failed
+            return (None, None)
+        result = probe(m)
+        if result is not None:
+            found = m
+        else:
+            failed = m
+            step *= 2
+    # found succeeded and failed did not: bisect in between
+    while found - failed > 1:
+        m = (failed + found) // 2
+        r = probe(m)
+        if r is not None:
+            found, result = m, r
+        else:
+            failed = m
+    return (found, result)
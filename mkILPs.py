@@ -1,40 +1,42 @@
 #!/usr/bin/env python3
 
 import argparse
-import re
 import os
 
-import model
 import load
+import fold
+from api import build_model
+from cache import SolveCache
+from results import Outcome
 
 def process(opts, fname):
-    bname = os.path.basename(fname)
-    try:
-        ncores = int(next(re.finditer('([0-9]+)Cores', fname)).group(1))
-    except StopIteration:
-        if opts.number_of_cores is None:
-            print('%s: Could not infer number of cores (specify with -m)' % fname)
-            return
-        else:
-            ncores = opts.number_of_cores
+    # the sets in a store know their number of cores themselves
+    if load.cores_of(fname) is None and opts.number_of_cores is None and \
+       not fname.endswith(load.STORE_SUFFIX):
+        print('%s: Could not infer number of cores (specify with -m)' % fname)
+        return
 
     print('Processing %s...' % fname)
 
     odir = opts.output_dir if opts.output_dir else os.path.dirname(fname)
     os.makedirs(odir, exist_ok=True)
 
+    solve_cache = SolveCache(opts.cache) if opts.cache else None
+
     id = 1
     for jobset in load.jobsets(fname):
         if opts.limit_job_sets and id > opts.limit_job_sets:
             print('Reached job set limit (%d), stopping.' % opts.limit_job_sets)
             break
 
-        if bname.startswith('Run'):
-            name = os.path.basename(fname.replace('/Run_', '-ID')).replace('.csv', '')
-        else:
-            name = bname.replace('.csv', '') + ('-ID%03d' % id)
+        name = load.jobset_name(fname, id, jobset)
         id += 1
 
+        ncores = load.jobset_cores(fname, jobset) or opts.number_of_cores
+        if ncores is None:
+            print('%s: Could not infer number of cores (specify with -m)' % name)
+            continue
+
         for i, j in  enumerate(jobset.jobs):
             j.id = i
 
@@ -57,31 +59,58 @@ def process(opts, fname):
                 print('Skipping %s: a heuristic already found a schedule.' % name)
                 continue
 
+        jobs = jobset.jobs
+        horizon = jobset.taskset.hyperperiod
+        frame = next(fold.frames(jobset.taskset.tasks, ncores), None) if opts.fold else None
+        if frame:
+            # a feasible solution repeats every frame; infeasibility is inconclusive
+            jobs = fold.fold(jobset, frame).jobs
+            for i, j in enumerate(jobs):
+                j.id = i
+            name += '-FOLD-%d' % frame
+            horizon = frame
+
         if opts.prefix_only:
             name += '-PREFIX-%03d' % opts.prefix_only
             # look only at the prefix of jobs released until the task with
             # the maximum period releases its third job
-            releases  = [j.release for j in jobset.jobs[:opts.prefix_only]]
-            job_costs = [j.cost for j in jobset.jobs[:opts.prefix_only]]
-            deadlines = [j.deadline for j in jobset.jobs[:opts.prefix_only]]
+            releases  = [j.release for j in jobs[:opts.prefix_only]]
+            job_costs = [j.cost for j in jobs[:opts.prefix_only]]
+            deadlines = [j.deadline for j in jobs[:opts.prefix_only]]
             predecessors = [[p.id for p in j.predecessors if p.id < opts.prefix_only]
-                            for j in jobset.jobs[:opts.prefix_only]]
+                            for j in jobs[:opts.prefix_only]]
             print('Preparing prefix model %s  (%d of %d jobs)...' % \
-                (name, len(releases), len(jobset.jobs)))
+                (name, len(releases), len(jobs)))
         else:
-            releases  = [j.release for j in jobset.jobs]
-            job_costs = [j.cost for j in jobset.jobs]
-            deadlines = [j.deadline for j in jobset.jobs]
-            predecessors = [[p.id for p in j.predecessors] for j in jobset.jobs]
-            print('Preparing model %s  (%d jobs)...' % (name, len(jobset.jobs)))
+            releases  = [j.release for j in jobs]
+            job_costs = [j.cost for j in jobs]
+            deadlines = [j.deadline for j in jobs]
+            predecessors = [[p.id for p in j.predecessors] for j in jobs]
+            print('Preparing model %s  (%d jobs)...' % (name, len(jobs)))
+
+        if solve_cache:
+            known = solve_cache.lookup(releases, deadlines, job_costs, predecessors, ncores)
+            if known:
+                print('Skipping %s: outcome already known (%s).' % (name, known.outcome.name))
+                continue
 
-        M = jobset.taskset.hyperperiod * 10 # "big M" constant
-        milp = model.make_gurobi_milp(releases, deadlines, job_costs, predecessors,
-                                      ncores, M, name)
+        # the prefix's jobs keep only the precedence constraints among them
+        milp = build_model(jobs[:opts.prefix_only] if opts.prefix_only else jobs,
+                           ncores, horizon=horizon, propagate=opts.propagate,
+                           reduce=opts.reduce, name=name)
+        if milp.outcome == Outcome.INFEASIBLE:
+            print('Skipping %s: infeasible by constraint propagation.' % name)
+            if solve_cache:
+                solve_cache.store(releases, deadlines, job_costs, predecessors,
+                                  ncores, Outcome.INFEASIBLE)
+            continue
+        if milp.reduction:
+            print('Reduced %s: %d isolated and %d forced jobs.' % (
+                name, len(milp.reduction.isolated), len(milp.reduction.forced)))
 
         model_fname = os.path.join(odir, '%s.%s' % (name, opts.format))
         print('Writing %s...' % model_fname)
-        milp.write(model_fname)
+        milp.model.write(model_fname)
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -128,6 +157,30 @@ def parse_args():
                         help="generate small, incomplete MILPs for just a prefix "
                              "of the job set")
 
+    parser.add_argument('--fold', default=False,
+                        action='store_true',
+                        help="where the periods allow it, generate MILPs for "
+                             "a pattern that repeats with a frame shorter than "
+                             "the hyperperiod (see fold.py)")
+
+    parser.add_argument('--propagate', default=False,
+                        action='store_true',
+                        help="tighten the windows of the jobs by constraint "
+                             "propagation (and skip workloads it proves "
+                             "infeasible)")
+
+    parser.add_argument('--reduce', default=False,
+                        action='store_true',
+                        help="leave jobs whose windows overlap no other job "
+                             "out of the MILPs, and fix the start times of "
+                             "jobs without slack (load solutions with "
+                             "schedule.py --reduce)")
+
+    parser.add_argument('-c', '--cache', default=None,
+                        action='store', metavar='DIR',
+                        help="don't generate MILPs for workloads with a known "
+                             "outcome in this solve cache")
+
     return parser.parse_args()
 
 def main():
@@ -47,22 +47,38 @@ def intervals_of_interest(releases, deadlines, costs):
             if ratio > 1)
 
 def make_gurobi_milp(releaseTimes, deadlines, executionTimes, predecessors,
-                     ncores, M, name='RAP', with_demand_constraints=False):
+                     ncores, M, name='RAP', with_demand_constraints=False,
+                     ids=None, forced=()):
+    """ids, if given, are the job numbers to use in variable names (e.g., of
+    the jobs that remain after reducer.reduce_jobs), and forced are the
+    (positions of the) jobs whose start time is their release"""
     njobs = len(releaseTimes)
     assert len(deadlines) == njobs
     assert len(executionTimes) == njobs
     assert len(predecessors) == njobs
+    forced = set(forced)
 
     # declare and init model
     m = Model(name)
 
-    #decision variables
+    #decision variables, keyed by job position
     x = m.addVars(njobs, ncores, vtype=GRB.BINARY, name = "assign")
     s = m.addVars(njobs, name = "startTime")
 
     # Auxiliary variables
     f = m.addVars(njobs, name = "finishTime")
 
+    if ids is not None:
+        for i, id in enumerate(ids):
+            s[i].VarName = 'startTime[%d]' % id
+            f[i].VarName = 'finishTime[%d]' % id
+            for k in range(ncores):
+                x[i,k].VarName = 'assign[%d,%d]' % (id, k)
+
+    # jobs without slack have nothing to decide but the core
+    for i in forced:
+        s[i].LB = s[i].UB = releaseTimes[i]
+
     # define finish times
     m.addConstrs((f[i] == s[i] + executionTimes[i] for i in range(njobs)),
                   'jobfinish')
@@ -86,7 +102,10 @@ def make_gurobi_milp(releaseTimes, deadlines, executionTimes, predecessors,
                     releaseTimes[j] >= deadlines[i])
 
     for i, j in combinations(range(njobs), 2):
-        if relevant(i, j):
+        if relevant(i, j) and i in forced and j in forced:
+            # both run at fixed times, which overlap: use different cores
+            m.addConstrs((x[i,k] + x[j,k] <= 1 for k in range(ncores)))
+        elif relevant(i, j):
             min_start = m.addVar(name = 'minStart[%d,%d]' % (i, j))
             max_fin   = m.addVar(name = 'maxStart[%d,%d]' % (i, j))
 
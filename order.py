@@ -1,30 +1,101 @@
-
-from heapq import heappush, heappop
+from instrument import NO_STATS
 
 class ConsiderationOrder(object):
+    """Jobs in increasing order of score (ties broken by job id).
+
+    This is an indexed binary heap: each queued job's heap entry is kept in
+    job.in_queue (False once the job is dequeued), together with the entry's
+    position in the heap, so that update() can move it up or down in place
+    instead of leaving stale entries behind."""
 
     def __init__(self, score_function, jobs=None):
         self.score_function = score_function
         self.queue = []
+        self.pushes = 0
+        self.updates = 0
+        self.pops = 0
         if jobs:
             for j in jobs:
-                self.add(j)
+                self.queue.append(self.entry(j, len(self.queue)))
+            for i in reversed(range(len(self.queue) // 2)):
+                self.sift_down(i)
+        self.peak_size = len(self.queue)
 
-    def add(self, job):
-        item = [self.score_function(job), job.id, job]
-        heappush(self.queue, item)
+    def entry(self, job, pos):
+        # [score, tie breaker, job, position in heap]
+        item = [self.score_function(job), job.id, job, pos]
         job.in_queue = item
+        self.pushes += 1
+        return item
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, job):
+        self.queue.append(self.entry(job, len(self.queue)))
+        self.peak_size = max(self.peak_size, len(self.queue))
+        self.sift_up(len(self.queue) - 1)
 
     def update(self, job):
-        del job.in_queue[2]
-        self.add(job)
+        item = job.in_queue
+        old_key = item[:2]
+        item[0] = self.score_function(job)
+        self.updates += 1
+        if item[:2] < old_key:
+            self.sift_up(item[3])
+        else:
+            self.sift_down(item[3])
 
     def next(self):
-        job = None
-        while self.queue and not job:
-            item = heappop(self.queue)
-            if len(item) > 2:
-                job = item[2]
-                job.in_queue = False
-
+        if not self.queue:
+            return None
+        item = self.queue[0]
+        last = self.queue.pop()
+        if self.queue:
+            self.queue[0] = last
+            last[3] = 0
+            self.sift_down(0)
+        self.pops += 1
+        job = item[2]
+        job.in_queue = False
         return job
+
+    def sift_up(self, pos):
+        heap = self.queue
+        item = heap[pos]
+        key = item[:2]
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            if heap[parent][:2] <= key:
+                break
+            heap[pos] = heap[parent]
+            heap[pos][3] = pos
+            pos = parent
+        heap[pos] = item
+        item[3] = pos
+
+    def sift_down(self, pos):
+        heap = self.queue
+        n = len(heap)
+        item = heap[pos]
+        key = item[:2]
+        while True:
+            child = 2 * pos + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1][:2] < heap[child][:2]:
+                child += 1
+            if key <= heap[child][:2]:
+                break
+            heap[pos] = heap[child]
+            heap[pos][3] = pos
+            pos = child
+        heap[pos] = item
+        item[3] = pos
+
+    def report(self, stats=NO_STATS):
+        "add this queue's operation counts to stats"
+        stats.count('queue_pushes', self.pushes)
+        stats.count('queue_updates', self.updates)
+        stats.count('queue_pops', self.pops)
+        stats.maximum('queue_peak_size', self.peak_size)
@@ -1,5 +1,7 @@
 #Purpose of this file is to read in a task set, generate jobs for one hyper period and put them in the input data format needed for the MILP solver
 
+import numpy as np
+
 import header
 import read_tasks_from_file as rtff
 
@@ -59,9 +61,28 @@ def main(num_cores, path):
 		
 		yield jobs, releaseTimes, deadlines, executionTimes, processors, M
 
+def job_arrays(task_set):
+	'''release times, deadlines and execution times of all jobs in one
+	hyperperiod, in the order of create_jobs and set_job_vars, computed per
+	task rather than per job'''
+	hyperperiod = header.computeHyperperiod(task_set)
+	releases = [np.arange(int(hyperperiod // task.period)) * task.period for task in task_set]
+	counts = [len(r) for r in releases]
+	releaseTimes = np.concatenate(releases)
+	deadlines = releaseTimes + np.repeat([task.rel_deadline for task in task_set], counts)
+	executionTimes = np.repeat([task.ex_time for task in task_set], counts)
+	return releaseTimes, deadlines, executionTimes
+
+def main_arrays(num_cores, path):
+	'''same as main, but without creating a header.Job for every job; jobs is
+	just the range of job indices'''
+	processors = set_processors(num_cores)
+	for task_set in read_task_sets(path):
+		M = set_overlap_var(task_set)
+		releaseTimes, deadlines, executionTimes = job_arrays(task_set)
+		#plain lists of Python numbers, as expected by the model and the cache
+		yield range(len(releaseTimes)), releaseTimes.tolist(), deadlines.tolist(), \
+			executionTimes.tolist(), processors, M
+
 if __name__ == '__main__':
 	main()
-
-
-
-
@@ -0,0 +1,92 @@
+from multiprocessing import Process, Queue
+from queue import Empty
+
+import dagfill
+import dagfeasint
+from decomp import decompose_limited_preemptive, decompose_restore
+from load import as_object
+from propagate import tighten_windows, restore_windows
+from repair import repair
+
+HEURISTICS = {
+    'backfill' : dagfill.paf_meta_heuristic,
+    'feasint'  : dagfeasint.paf_meta_heuristic,
+}
+
+VARIANTS = [as_object({
+    'name'      : name + ('+decompose' if decompose else ''),
+    'heuristic' : name,
+    'decompose' : decompose,
+}) for decompose in [False, True] for name in ['feasint', 'backfill']]
+
+def run_variant(variant, jobs, ncores, with_repair=False, tighten=False, **limits):
+    """run one heuristic; return the schedule as a list of (core, start-time)
+    tuples in job order, or None if it failed"""
+    # assumption: j.id is the index of j in jobs
+    if variant.decompose:
+        decompose_limited_preemptive(jobs)
+    # after the decomposition, which expects the windows of a DAG's jobs to agree
+    if not tighten or tighten_windows(jobs, ncores):
+        (unassigned, schedule, _) = HEURISTICS[variant.heuristic](jobs, ncores, **limits)
+        if unassigned and with_repair:
+            (schedule, unassigned) = repair(schedule, unassigned)
+    else:
+        unassigned = jobs
+    if tighten:
+        restore_windows(jobs)
+    if variant.decompose:
+        decompose_restore(jobs)
+    if unassigned:
+        return None
+    placement = [None] * len(jobs)
+    for core in schedule:
+        for j, start in schedule[core]:
+            placement[j.id] = (core, start)
+    return placement
+
+def worker(variant, jobs, ncores, with_repair, tighten, limits, results):
+    try:
+        placement = run_variant(variant, jobs, ncores, with_repair, tighten, **limits)
+    except Exception:
+        # e.g., the decomposition rejects cyclic precedence constraints
+        placement = None
+    results.put((variant.name, placement))
+
+def race(jobs, ncores, variants, accept=lambda placement: True,
+         with_repair=False, tighten=False, poll=1.0, **limits):
+    """run all variants concurrently; return (name, schedule) of the first
+    one to produce an acceptable schedule, or (None, None)
+
+    A worker that dies without reporting (e.g., killed for lack of memory,
+    or by a crash in native code) counts as a failed variant; its death is
+    noticed within poll seconds."""
+    results = Queue()
+    procs = dict((v.name, Process(target=worker,
+                                  args=(v, jobs, ncores, with_repair, tighten, limits, results)))
+                 for v in variants)
+    for p in procs.values():
+        p.start()
+    winner, placement = None, None
+    pending = set(procs)
+    try:
+        while pending:
+            try:
+                name, candidate = results.get(timeout=poll)
+            except Empty:
+                # a worker puts its result before it exits, so one that has
+                # exited and still left nothing in the queue has died
+                dead = [name for name in pending if not procs[name].is_alive()]
+                if dead and results.empty():
+                    pending.difference_update(dead)
+                continue
+            pending.discard(name)
+            if candidate and accept(candidate):
+                winner, placement = name, candidate
+                break
+    finally:
+        # cancel whatever is still running
+        for p in procs.values():
+            if p.is_alive():
+                p.terminate()
+            p.join()
+    return winner, placement
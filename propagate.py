@@ -0,0 +1,114 @@
+import numpy as np
+
+def topological_order(predecessors):
+    "job indices such that each job comes after all its predecessors"
+    successors = [[] for _ in predecessors]
+    pending = [len(preds) for preds in predecessors]
+    for j, preds in enumerate(predecessors):
+        for p in preds:
+            successors[p].append(j)
+    ready = [j for j in range(len(predecessors)) if not pending[j]]
+    order = []
+    while ready:
+        j = ready.pop()
+        order.append(j)
+        for s in successors[j]:
+            pending[s] -= 1
+            if not pending[s]:
+                ready.append(s)
+    assert len(order) == len(predecessors) # precedence constraints must be acyclic
+    return order
+
+def precedence(releases, deadlines, costs, predecessors, order):
+    """a job cannot start before its predecessors can have finished, nor
+    finish after its successors must have started; order is a topological
+    order of the job indices"""
+    for j in order:
+        for p in predecessors[j]:
+            releases[j] = max(releases[j], releases[p] + costs[p])
+    for j in reversed(order):
+        for p in predecessors[j]:
+            deadlines[p] = min(deadlines[p], deadlines[j] - costs[j])
+
+def edge_finding(releases, deadlines, costs, ncores):
+    """return releases raised by edge-finding on ncores identical cores, or
+    None if some set of jobs cannot fit into its window at all
+
+    Let Omega be the jobs with windows within [a, b], and slack = ncores *
+    (b - a) - (total cost of Omega). If a job i with a <= r_i < b < d_i costs
+    more than the slack, it cannot finish before all of Omega has, and it
+    cannot start before b - slack, as Omega's work beyond (ncores - 1) * (b -
+    a) cannot run in parallel with i (Nuijten's rule for cumulative
+    resources, with every job using one of ncores cores). Only the smallest
+    slack over all a <= r_i matters for a given b."""
+    releases  = np.asarray(releases)
+    deadlines = np.asarray(deadlines)
+    costs     = np.asarray(costs)
+    points = np.unique(releases)
+    # index of the latest point at or before each release
+    at = np.searchsorted(points, releases, side='right') - 1
+    updated = releases.copy()
+    for b in np.unique(deadlines):
+        inside = deadlines <= b
+        # energy[k]: total cost of jobs within [points[k], b]
+        energy = np.cumsum(np.bincount(at[inside], weights=costs[inside],
+                                       minlength=len(points))[::-1])[::-1]
+        slack = ncores * (b - points) - energy
+        slack[points >= b] = np.inf
+        if (slack < 0).any():
+            return None
+        least = np.minimum.accumulate(slack)[at]
+        i = (releases < b) & (deadlines > b) & (least < costs)
+        updated[i] = np.maximum(updated[i], b - least[i])
+    return updated
+
+def tighten(releases, deadlines, costs, predecessors, ncores, max_rounds=100):
+    """tighten the windows of jobs by propagating precedence constraints and
+    edge-finding (forward, and mirrored in time for the deadlines) until
+    nothing changes anymore; return the new (releases, deadlines), or None if
+    this proves that the jobs cannot be scheduled on ncores cores"""
+    releases, deadlines = list(releases), list(deadlines)
+    order = topological_order(predecessors) if any(predecessors) else None
+
+    for _ in range(max_rounds):
+        before = (list(releases), list(deadlines))
+        if order:
+            precedence(releases, deadlines, costs, predecessors, order)
+        if any(d - r < c for (r, d, c) in zip(releases, deadlines, costs)):
+            return None
+        raised = edge_finding(releases, deadlines, costs, ncores)
+        if raised is None:
+            return None
+        # the same on the mirrored time line, where deadlines become releases
+        mirrored = edge_finding([-d for d in deadlines], [-r for r in releases],
+                                costs, ncores)
+        if mirrored is None:
+            return None
+        releases = raised.tolist()
+        deadlines = (-mirrored).tolist()
+        if (releases, deadlines) == before:
+            break
+    if any(d - r < c for (r, d, c) in zip(releases, deadlines, costs)):
+        return None
+    return (releases, deadlines)
+
+def tighten_windows(jobs, ncores):
+    """tighten the windows of jobs in place, keeping the original ones for
+    restore_windows; return False if the jobs cannot be scheduled"""
+    # assumption: j.id is the index of j in jobs
+    windows = tighten([j.release for j in jobs], [j.deadline for j in jobs],
+                      [j.cost for j in jobs],
+                      [[p.id for p in j.predecessors] for j in jobs], ncores)
+    for j in jobs:
+        j.prop_release  = j.release
+        j.prop_deadline = j.deadline
+    if windows:
+        for j, release, deadline in zip(jobs, *windows):
+            j.release  = release
+            j.deadline = deadline
+    return windows is not None
+
+def restore_windows(jobs):
+    for j in jobs:
+        j.release  = j.prop_release
+        j.deadline = j.prop_deadline
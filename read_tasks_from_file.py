@@ -1,5 +1,5 @@
 import csv, task_generator
-import ast
+import load
 
 def main(path="/home/eghonghonaye/Desktop/tasks.csv"):
 	task_list = []
@@ -7,7 +7,7 @@ def main(path="/home/eghonghonaye/Desktop/tasks.csv"):
 	with open(path) as csv_file:
 	    csv_reader = csv.reader(csv_file, delimiter=',')
 	    for row in csv_reader:
-	    	task_set = ast.literal_eval(row[0])
+	    	task_set = load.task_list(row[0])
 	    	#print(task_set)
 	    	for task in task_set:
 	    		number = task[0]
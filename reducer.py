@@ -0,0 +1,53 @@
+from load import as_object
+
+def isolated_jobs(releases, deadlines, predecessors):
+    """indices of the jobs whose windows overlap no other job's window and
+    that are not part of any precedence constraint"""
+    constrained = set()
+    for j, preds in enumerate(predecessors):
+        if preds:
+            constrained.add(j)
+            constrained.update(preds)
+    order = sorted(range(len(releases)), key=lambda i: (releases[i], deadlines[i]))
+    isolated = []
+    # latest deadline among the jobs released so far
+    reach = None
+    for k, i in enumerate(order):
+        before = reach is None or reach <= releases[i]
+        after = k + 1 == len(order) or releases[order[k + 1]] >= deadlines[i]
+        if before and after and i not in constrained:
+            isolated.append(i)
+        reach = deadlines[i] if reach is None else max(reach, deadlines[i])
+    return sorted(isolated)
+
+def reduce_jobs(releases, deadlines, costs, predecessors):
+    """split off the isolated jobs, which can run at their release on any
+    core, and find the jobs with zero slack among the others, whose start
+    times are forced
+
+    kept lists the indices of the jobs that remain, and forced the positions
+    (among the kept jobs) of the ones with zero slack."""
+    # a job that does not even fit into its window is left to fail as usual
+    isolated = [i for i in isolated_jobs(releases, deadlines, predecessors)
+                if deadlines[i] - releases[i] >= costs[i]]
+    dropped = set(isolated)
+    kept = [i for i in range(len(releases)) if i not in dropped]
+    forced = [k for k, i in enumerate(kept) if deadlines[i] - releases[i] == costs[i]]
+    return as_object({
+        'kept'     : kept,
+        'isolated' : isolated,
+        'forced'   : forced,
+    })
+
+def kept_columns(reduction, releases, deadlines, costs, predecessors):
+    "the (releases, deadlines, costs, predecessors) of the kept jobs"
+    position = dict((i, k) for k, i in enumerate(reduction.kept))
+    return ([releases[i] for i in reduction.kept],
+            [deadlines[i] for i in reduction.kept],
+            [costs[i] for i in reduction.kept],
+            [[position[p] for p in predecessors[i]] for i in reduction.kept])
+
+def isolated_placement(reduction, releases, costs):
+    "(job index, core, start time, finish time) for each isolated job"
+    # nothing else can run at the same time, so the first core will do
+    return [(i, 0, releases[i], releases[i] + costs[i]) for i in reduction.isolated]
@@ -0,0 +1,217 @@
+from bisect import bisect_left, insort
+
+class PartialSchedule(object):
+    """A partial schedule that supports placing and removing jobs, with a
+    journal so that unsuccessful sequences of moves can be undone."""
+
+    def __init__(self, schedule):
+        # assumption: j.id is unique for each job
+        self.timeline = {}
+        self.placement = {}
+        for core in schedule:
+            self.timeline[core] = sorted((start, j.id, j) for j, start in schedule[core])
+            for j, start in schedule[core]:
+                self.placement[j] = (core, start)
+        self.journal = []
+
+    def place(self, j, core, start):
+        insort(self.timeline[core], (start, j.id, j))
+        self.placement[j] = (core, start)
+        self.journal.append((True, j, core, start))
+
+    def remove(self, j):
+        core, start = self.placement.pop(j)
+        self.drop(core, start, j)
+        self.journal.append((False, j, core, start))
+
+    def drop(self, core, start, j):
+        timeline = self.timeline[core]
+        # (start, id) identifies the entry, no need to compare the jobs
+        del timeline[bisect_left(timeline, (start, j.id))]
+
+    def rollback(self, mark):
+        while len(self.journal) > mark:
+            placed, j, core, start = self.journal.pop()
+            if placed:
+                self.drop(core, start, j)
+                del self.placement[j]
+            else:
+                insort(self.timeline[core], (start, j.id, j))
+                self.placement[j] = (core, start)
+
+    def start_of(self, j, moved={}):
+        return moved[j] if j in moved else self.placement[j][1]
+
+    def window(self, j, moved={}):
+        """the interval [lo, hi) that j must fit in, given its placed relatives
+        (some of which may be about to move, see shift_insert)"""
+        lo, hi = j.release, j.deadline
+        for p in j.predecessors:
+            if p in self.placement:
+                lo = max(lo, self.start_of(p, moved) + p.cost)
+        for s in j.successors:
+            if s in self.placement:
+                hi = min(hi, self.start_of(s, moved))
+        return lo, hi
+
+    def find_slot(self, j, core):
+        "latest feasible start time of j on core, if any"
+        lo, hi = self.window(j)
+        timeline = self.timeline[core]
+        # look at the gaps between placed jobs, from the latest to the
+        # earliest, starting with the last job that starts before hi
+        gap_end = hi
+        for k in range(bisect_left(timeline, (hi,)) - 1, -1, -1):
+            start, _, sj = timeline[k]
+            end = start + sj.cost
+            if end < gap_end:
+                candidate = gap_end - j.cost
+                if candidate >= max(lo, end):
+                    return candidate
+            gap_end = min(gap_end, start)
+            if gap_end - j.cost < lo:
+                return None
+        if gap_end - j.cost >= lo:
+            return gap_end - j.cost
+        return None
+
+    def shift_insert(self, j, core):
+        """try to make room for j on core by pushing the jobs before it
+        earlier and the jobs after it later; return True if j was placed"""
+        lo, hi = self.window(j)
+        timeline = self.timeline[core]
+        # only positions among the jobs that overlap the window are worth
+        # trying: from the last job that starts before lo (which may end
+        # after it) to the first one that starts at or after hi
+        first = max(0, bisect_left(timeline, (lo,)) - 1)
+        last = bisect_left(timeline, (hi,))
+        for k in range(first, last + 1):
+            # j goes between timeline[k-1] and timeline[k], preferably as
+            # late as possible
+            latest = hi - j.cost
+            if k < len(timeline):
+                latest = min(latest, max(lo, timeline[k][0]))
+            if latest < lo:
+                continue
+            moved = {j: latest}
+            # push the later ones back...
+            ok = True
+            prev_end = latest + j.cost
+            for i in range(k, len(timeline)):
+                start, _, sj = timeline[i]
+                if start >= prev_end:
+                    break
+                moved[sj] = prev_end
+                if prev_end + sj.cost > self.window(sj, moved)[1]:
+                    ok = False
+                    break
+                prev_end += sj.cost
+            # ...and the earlier ones forward
+            next_start = latest
+            for i in range(k - 1, -1, -1) if ok else ():
+                start, _, sj = timeline[i]
+                if start + sj.cost <= next_start:
+                    break
+                moved[sj] = next_start - sj.cost
+                if moved[sj] < self.window(sj, moved)[0]:
+                    ok = False
+                    break
+                next_start = moved[sj]
+            if ok and latest >= self.window(j, moved)[0] and \
+               latest + j.cost <= self.window(j, moved)[1]:
+                del moved[j]
+                for sj in moved:
+                    self.remove(sj)
+                for sj in moved:
+                    self.place(sj, core, moved[sj])
+                self.place(j, core, latest)
+                return True
+        return False
+
+    def blockers(self, core, lo, hi):
+        timeline = self.timeline[core]
+        first = max(0, bisect_left(timeline, (lo,)) - 1)
+        return [sj for start, _, sj in timeline[first:bisect_left(timeline, (hi,))]
+                if start + sj.cost > lo]
+
+    def as_dict(self):
+        return dict((core, [(j, start) for start, _, j in self.timeline[core]])
+                    for core in self.timeline)
+
+
+class Repair(object):
+
+    def __init__(self, schedule, depth, budget):
+        self.sched = PartialSchedule(schedule)
+        self.depth = depth
+        self.budget = budget
+        # jobs that are currently being inserted, which must not be ejected
+        self.pinned = set()
+
+    def insert(self, j, depth):
+        self.budget -= 1
+        if self.budget < 0:
+            return False
+        # first, see if there's a gap anywhere
+        for core in self.sched.timeline:
+            start = self.sched.find_slot(j, core)
+            if start is not None:
+                self.sched.place(j, core, start)
+                return True
+        # nope, try shifting things around a bit
+        for core in self.sched.timeline:
+            if self.sched.shift_insert(j, core):
+                return True
+        if not depth:
+            return False
+        # still no luck, try ejecting a job in the way and placing it elsewhere
+        # (later on the same core, on another core, or by ejecting yet
+        # another job)
+        self.pinned.add(j)
+        lo, hi = self.sched.window(j)
+        for core in self.sched.timeline:
+            for b in self.sched.blockers(core, lo, hi):
+                if b in self.pinned:
+                    continue
+                mark = len(self.sched.journal)
+                self.sched.remove(b)
+                start = self.sched.find_slot(j, core)
+                if start is not None:
+                    self.sched.place(j, core, start)
+                    if self.insert(b, depth - 1):
+                        self.pinned.remove(j)
+                        return True
+                self.sched.rollback(mark)
+                if self.budget < 0:
+                    break
+        self.pinned.remove(j)
+        return False
+
+def topological(jobs):
+    "order jobs such that predecessors come first"
+    jobs = set(jobs)
+    pending = dict((j, sum((1 for p in j.predecessors if p in jobs))) for j in jobs)
+    ready = sorted((j for j in jobs if not pending[j]), key=lambda j: j.id, reverse=True)
+    order = []
+    while ready:
+        j = ready.pop()
+        order.append(j)
+        for s in j.successors:
+            if s in jobs:
+                pending[s] -= 1
+                if not pending[s]:
+                    ready.append(s)
+    return order
+
+def repair(schedule, unassigned, depth=2, budget=1000):
+    """try to fit the unassigned jobs into the partial schedule by shifting
+    jobs, moving them between cores, and bounded ejection chains; return
+    the repaired schedule and the jobs that still could not be placed"""
+    r = Repair(schedule, depth, budget)
+    order = topological(unassigned)
+    for i, j in enumerate(order):
+        r.budget = budget
+        if not r.insert(j, depth):
+            # no point in going on, the job set is not schedulable like this
+            return r.sched.as_dict(), set(order[i:])
+    return r.sched.as_dict(), set()
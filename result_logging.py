@@ -1,9 +1,130 @@
+import atexit
 import csv
+import io
+import os
+import threading
 
+from multiprocessing.util import Finalize
 
-def log_results(experiment_number, results):
+try:
+	import fcntl
+except ImportError:
+	# no advisory locks (e.g., on Windows), rely on O_APPEND alone
+	fcntl = None
+
+
+class ResultSink(object):
+	"""Buffered appender of CSV rows to one results file.
+
+	Rows are flushed once max_rows rows or max_bytes bytes are pending, by a
+	timer at most max_seconds after the oldest pending row arrived (None for
+	no timer), as well as on flush()/close() and when leaving a with block;
+	max_rows=1 writes every row through. Each flush appends all pending rows
+	with a single write while holding an exclusive lock on the file, so rows
+	from concurrent processes never interleave."""
+
+	def __init__(self, file, max_rows=1000, max_bytes=1 << 20, max_seconds=5.0):
+		self.file = file
+		self.max_rows = max_rows
+		self.max_bytes = max_bytes
+		self.max_seconds = max_seconds
+		self.lock = threading.Lock()
+		self.buffer = io.StringIO()
+		self.writer = csv.writer(self.buffer)
+		self.pending = 0
+		self.timer = None
+		self.pid = os.getpid()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def write(self, row):
+		self.writerows([row])
+
+	def writerows(self, rows):
+		with self.lock:
+			if self.pid != os.getpid():
+				# inherited from the parent process, which writes these itself
+				self.discard()
+				self.pid = os.getpid()
+			self.writer.writerows(rows)
+			self.pending += len(rows)
+			if self.pending >= self.max_rows or \
+			   self.buffer.tell() >= self.max_bytes:
+				self.write_pending()
+			elif self.timer is None and self.max_seconds is not None:
+				# flush the oldest pending row in time even if no other follows
+				self.timer = threading.Timer(self.max_seconds, self.flush)
+				# the exit handlers flush whatever is left
+				self.timer.daemon = True
+				self.timer.start()
+
+	def flush(self):
+		with self.lock:
+			if self.pid == os.getpid():
+				self.write_pending()
+
+	def close(self):
+		self.flush()
+
+	def discard(self):
+		self.buffer.seek(0)
+		self.buffer.truncate()
+		self.pending = 0
+		if self.timer is not None:
+			# a no-op if called by the timer itself, or after a fork
+			self.timer.cancel()
+			self.timer = None
+
+	def write_pending(self):
+		if not self.pending:
+			return
+		with open(self.file, 'a') as writeFile:
+			if fcntl:
+				fcntl.flock(writeFile, fcntl.LOCK_EX)
+			writeFile.write(self.buffer.getvalue())
+			writeFile.flush()
+			# the lock is released when the file is closed
+		self.discard()
+
+
+# shared sinks used by log_results, one per results file and process
+sinks = {}
+sinks_lock = threading.Lock()
+exit_flush_pid = None
+
+def flush_all():
+	for sink in list(sinks.values()):
+		sink.flush()
+
+def results_sink(experiment_number):
+	"the shared ResultSink for experiment_number's results file"
+	global exit_flush_pid
 	file = str(experiment_number) + ".csv"
+	with sinks_lock:
+		if exit_flush_pid != os.getpid():
+			exit_flush_pid = os.getpid()
+			atexit.register(flush_all)
+			# worker processes of multiprocessing skip atexit handlers
+			Finalize(None, flush_all, exitpriority=0)
+		if file not in sinks:
+			sinks[file] = ResultSink(file)
+		return sinks[file]
+
+def log_results(experiment_number, results, buffered=True):
+	"""append a row to experiment_number's results file; it is written
+	within a few seconds, or before this returns if not buffered (buffered
+	rows are lost if the process is killed by a signal before that)"""
+	sink = results_sink(experiment_number)
+	sink.write(results)
+	if not buffered:
+		sink.flush()
 
-	with open(file, 'a') as writeFile:
-		writer = csv.writer(writeFile)
-		writer.writerow(results)
\ No newline at end of file
+def log_many_results(experiment_number, rows, buffered=True):
+	sink = results_sink(experiment_number)
+	sink.writerows(rows)
+	if not buffered:
+		sink.flush()
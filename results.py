@@ -61,6 +61,19 @@ def count_results(opts):
         results[cores][tasks][util][outcome].append(id)
     return results
 
+def count_stored_results(opts):
+    "like count_results, but from the latest outcomes in an experiment store"
+    # imported here, as the store itself builds on this module
+    from expstore import ExperimentStore
+    results = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: ([], [], [], [], []))))
+    with ExperimentStore(opts.db) as store:
+        for (_, cores, tasks, util, id, _, outcome) in store.latest_outcomes(opts.source):
+            if cores is None:
+                # not named after its configuration
+                continue
+            results[cores][tasks][util][outcome].append(id)
+    return results
+
 def print_results(opts, results):
     print("%6s,%6s,%5s,%9s,%18s,%11s,%10s,%11s,%6s,%18s" % (
         'Cores',
@@ -127,9 +140,19 @@ def print_all(opts, results):
                     ))
 
 
+def outcomes(opts):
+    "(file or job-set name, outcome) pairs"
+    if opts.db:
+        from expstore import ExperimentStore
+        with ExperimentStore(opts.db) as store:
+            for (name, _, _, _, _, _, outcome) in store.latest_outcomes(opts.source):
+                yield (name, outcome)
+    else:
+        for fname in opts.input_files:
+            yield (fname, parse_outcome(fname))
+
 def list(opts):
-    for fname in opts.input_files:
-        outcome = parse_outcome(fname)
+    for (fname, outcome) in outcomes(opts):
         if opts.list_feasible and outcome == Outcome.FEASIBLE:
             print(fname)
         if opts.list_infeasible and outcome == Outcome.INFEASIBLE:
@@ -172,6 +195,16 @@ def parse_args():
                         action='store', type=int,
                         help='total to assume for schedulability purposes')
 
+    parser.add_argument('--db', default=None,
+                        action='store', metavar='FILE',
+                        help='summarize the experiment store FILE instead of '
+                             'the given files')
+
+    parser.add_argument('--source', default=None,
+                        action='store', choices=['milp', 'heuristic'],
+                        help='with --db, consider only outcomes of the MILP '
+                             'solver or of the heuristics')
+
     return parser.parse_args()
 
 def main():
@@ -180,7 +213,7 @@ def main():
        opts.list_incomplete:
         list(opts)
     else:
-        r = count_results(opts)
+        r = count_stored_results(opts) if opts.db else count_results(opts)
         if opts.list_all:
             print_all(opts, r)
         else:
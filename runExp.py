@@ -1,18 +1,107 @@
-import sys
-import milpForm 
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import gurobipy
+import milpForm
 import parser
 import result_logging as lg
+from cache import SolveCache
+
+#one Gurobi environment per worker thread, as environments must not be shared
+local = threading.local()
+#all of them, to be disposed of once the threads are done (each environment
+#holds a license token)
+created = []
+created_lock = threading.Lock()
+
+def solve(opts, cache, experiment):
+	jobs, releaseTimes, deadlines, executionTimes, processors, M = experiment
+	if not hasattr(local, 'env'):
+		local.env = gurobipy.Env() if opts.parallel > 1 else None
+		#models are bound to their environment, so templates are per thread, too
+		local.templates = milpForm.ModelTemplates(threads=opts.threads, env=local.env) \
+			if opts.reuse_models else None
+		with created_lock:
+			created.append((local.env, local.templates))
+	return milpForm.runExperiment(jobs, releaseTimes, deadlines, executionTimes, processors, M, cache,
+		opts.threads, local.env, local.templates)
+
+def release():
+	'''dispose of the models and environments of all worker threads'''
+	with created_lock:
+		for env, templates in created:
+			#models first, they are bound to their environment
+			if templates is not None:
+				templates.dispose()
+			if env is not None:
+				env.dispose()
+		created.clear()
+
+def in_order(executor, fn, items, window):
+	'''map fn over items on executor, with at most window items in flight,
+	yielding the results in the order of the items'''
+	pending = deque()
+	for item in items:
+		pending.append(executor.submit(fn, item))
+		if len(pending) >= window:
+			yield pending.popleft().result()
+	while pending:
+		yield pending.popleft().result()
 
 def main():
-	number_of_cores = int(sys.argv[1])
-	number_of_tasks = int(sys.argv[2])
-	for utilisation in [90,80,70,60,50,40,30,20,10]:
-		path = "TaskSets/" + str(number_of_cores) + "Cores" + str(number_of_tasks) + "Tasks" + str(utilisation) + ".csv"
-		resultPath = "MILPresults" + str(number_of_cores) + "Cores" + str(number_of_tasks) + "Tasks"
+	opts = parse_args()
+	#optional: directory of the solve cache to consult and update
+	cache = SolveCache(opts.cache) if opts.cache else None
+	try:
+		run_all(opts, cache)
+	finally:
+		#the executor has joined its threads by now
+		release()
+
+def run_all(opts, cache):
+	number_of_cores = opts.cores
+	number_of_tasks = opts.tasks
+	with ThreadPoolExecutor(max_workers=opts.parallel) as executor:
+		for utilisation in [90,80,70,60,50,40,30,20,10]:
+			path = "TaskSets/" + str(number_of_cores) + "Cores" + str(number_of_tasks) + "Tasks" + str(utilisation) + ".csv"
+			resultPath = "MILPresults" + str(number_of_cores) + "Cores" + str(number_of_tasks) + "Tasks"
+
+			experiments = parser.main_arrays(number_of_cores,path)
+			#results come back in order, so the CSV looks the same as if run one by one
+			for status in in_order(executor, lambda e: solve(opts, cache, e), experiments, 2 * opts.parallel):
+				lg.log_results(resultPath, [utilisation,status])
+
+def parse_args():
+	parser = argparse.ArgumentParser(
+		description="Run the MILP experiments for one platform and task-set size")
+
+	parser.add_argument('cores', type=int,
+						help='number of cores')
+
+	parser.add_argument('tasks', type=int,
+						help='number of tasks per task set')
+
+	parser.add_argument('cache', nargs='?', default=None,
+						help='directory of the solve cache to consult and update')
+
+	parser.add_argument('-j', '--parallel', default=1,
+						action='store', type=int,
+						help='number of experiments to solve concurrently')
+
+	parser.add_argument('-t', '--threads', default=None,
+						action='store', type=int,
+						help='number of solver threads per experiment '
+						'(default: let Gurobi decide)')
+
+	parser.add_argument('--reuse-models', default=False,
+						action='store_true',
+						help='build the model once per period signature and only '
+						'update the execution times for further task sets with '
+						'the same periods')
 
-		for jobs, releaseTimes, deadlines, executionTimes, processors, M in parser.main(number_of_cores,path):
-			status = milpForm.runExperiment(jobs, releaseTimes, deadlines, executionTimes, processors, M)
-			lg.log_results(resultPath, [utilisation,status])
+	return parser.parse_args()
 
 if __name__ == '__main__':
-	main()
\ No newline at end of file
+	main()
@@ -6,34 +6,29 @@ import os
 import sys
 import ast
 
-from itertools import combinations
 from collections import defaultdict
 
-import backfill
-import feasint
-import dagfill
-import dagfeasint
-from decomp import decompose_limited_preemptive, decompose_restore
+import fold
+import reducer
+import mincores
+from propagate import tighten
 
 import cProfile
 
 import load
-from load import as_object
+from cache import SolveCache, job_params
+from results import Outcome
+from instrument import PhaseStats, NO_STATS, timed
+from expstore import ExperimentStore, HEURISTIC, MILP
+from api import allocations, listed_solution, validate, schedule_jobset
 
 ASSIGN_PATTERN = re.compile(r'^assign\[([0-9]+),([0-9]+)\] (.+)$', re.MULTILINE)
 START_TIME = re.compile(r'^startTime\[([0-9]+)\] (.+)$', re.MULTILINE)
 FINISH_TIME = re.compile(r'^finishTime\[([0-9]+)\] (.+)$', re.MULTILINE)
 
-def allocations(mapping, start_times, finish_times):
-    return [as_object({
-        'id'    : i,
-        'core'  : mapping[i],
-        'start' : start_times[i],
-        'end'   : finish_times[i],
-    }) for i in sorted(mapping.keys())]
-
-
-def load_solution(fname):
+def load_solution(fname, extra=()):
+    """extra lists (job, core, start time, finish time) of jobs that are not
+    part of the MILP, e.g., the isolated jobs dropped by the reducer"""
     sol = open(fname, 'r').read()
     if not 'Solution for model' in sol:
         return None
@@ -62,21 +57,28 @@ def load_solution(fname):
         ftime = round(ast.literal_eval(m.group(2)), 2)
         finish_times[job_id] = ftime
 
-    return allocations(mapping, start_times, finish_times)
-
-def heuristic_solution(schedule):
-    # convert assignments
-    mapping = {}
-    start_times = {}
-    finish_times = {}
-    for core in schedule:
-        for job, start in schedule[core]:
-            mapping[job.id] = core
-            start_times[job.id] = start
-            finish_times[job.id] = start + job.cost
+    for (job_id, core_id, stime, ftime) in extra:
+        mapping[job_id] = core_id
+        start_times[job_id] = stime
+        finish_times[job_id] = ftime
 
     return allocations(mapping, start_times, finish_times)
 
+def milp_extra(opts, jobs, ncores):
+    """the jobs that mkILPs.py --reduce (with the same --propagate setting)
+    leaves out of the MILP of jobs, placed as in load_solution's extra"""
+    if not opts.reduce:
+        return ()
+    releases, deadlines, costs, predecessors = job_params(jobs)
+    if opts.propagate:
+        windows = tighten(releases, deadlines, costs, predecessors, ncores)
+        if not windows:
+            # no MILP was generated
+            return ()
+        releases, deadlines = windows
+    reduction = reducer.reduce_jobs(releases, deadlines, costs, predecessors)
+    return reducer.isolated_placement(reduction, releases, costs)
+
 def show(opts, allocations, file=sys.stdout):
     print('%5s,%6s,%10s,%10s,%10s,%10s,%10s,%6s,%11s' % (
         'Job', 'Core', 'Start', 'End',
@@ -90,83 +92,110 @@ def show(opts, allocations, file=sys.stdout):
             j.job.task.id, j.job.job_of_task,
         ), file=file)
 
-def validate(all_jobs, allocations):
-    assert len(all_jobs) == len(allocations)
-    for j, alloc in zip(all_jobs, allocations):
-        assert j.id == alloc.id
-        alloc.job = j
-        j.alloc = alloc
-
-    allocated = set()
-    # check that all allocations are in the corresponding job's
-    # feasibility window and non-overlapping
-    for alloc in allocations:
-        allocated.add(alloc.job)
-        # sanity check allocations
-        assert alloc.start >= alloc.job.release
-        assert alloc.end <= alloc.job.deadline
-        assert alloc.end - alloc.start == alloc.job.cost
-        # check for overlaps
-    for alloc, other_alloc in combinations(allocations, 2):
-        if other_alloc.core == alloc.core:
-            # make sure there is no overlap
-            assert alloc.start >= other_alloc.end or \
-                   other_alloc.start >= alloc.end
-    # make sure no job was missed
-    for j in all_jobs:
-        assert j in allocated
-    # make sure the schedule is DAG-compliant
-    for j in all_jobs:
-        # all predecessors must finish before this job's start
-        for p in j.predecessors:
-            assert p.alloc.end <= j.alloc.start
-    assert len(allocated) == len(all_jobs)
-
-def process(opts, fname):
-    bname = os.path.basename(fname)
-    try:
-        ncores = int(next(re.finditer('([0-9]+)Cores', fname)).group(1))
-    except StopIteration:
-        if opts.number_of_cores is None:
-            print('%s: Could not infer number of cores (specify with -m)' % fname)
-            return
-        else:
-            ncores = opts.number_of_cores
+def schedule_rows(allocations):
+    "the rows that show() prints, as tuples for the experiment store"
+    return [(j.id, j.core, j.start, j.end,
+             j.job.release, j.job.deadline, j.job.cost,
+             j.job.task.id, j.job.job_of_task) for j in allocations]
+
+def process(opts, fname, store=None, run=None):
+    # the sets in a store know their number of cores themselves
+    if load.cores_of(fname) is None and opts.number_of_cores is None and \
+       not opts.min_cores and not fname.endswith(load.STORE_SUFFIX):
+        print('%s: Could not infer number of cores (specify with -m)' % fname)
+        return
 
     if not opts.compare:
         print('Processing %s...' % fname)
 
     odir = opts.output_dir if opts.output_dir else os.path.dirname(fname)
-    os.makedirs(odir, exist_ok=True)
+    if not store:
+        os.makedirs(odir, exist_ok=True)
+
+    solve_cache = SolveCache(opts.cache) if opts.cache else None
+    stats_file = open(opts.stats, 'a') if opts.stats else None
 
     id = 1
-    for jobset in load.jobsets(fname):
-        if bname.startswith('Run'):
-            name = os.path.basename(fname.replace('/Run_', '-ID')).replace('.csv', '')
-        else:
-            name = bname.replace('.csv', '') + ('-ID%03d' % id)
+    for jobset, load_time in timed(load.jobsets(fname)):
+        name = load.jobset_name(fname, id, jobset)
         id += 1
 
         if not opts.job_set_index is None and id - 1 != opts.job_set_index:
             continue
 
+        ncores = load.jobset_cores(fname, jobset) or opts.number_of_cores
+        if ncores is None and not opts.min_cores:
+            print('%s: Could not infer number of cores (specify with -m)' % name)
+            continue
+
         for i, j in enumerate(jobset.jobs):
             j.id = i
 
+        if stats_file:
+            stats = PhaseStats(file=fname, jobset=name, jobs=len(jobset.jobs),
+                               cores=ncores, heuristic=opts.heuristic,
+                               decompose=bool(opts.decompose))
+        else:
+            stats = NO_STATS
+        stats.add_time('load', load_time)
+
+        def write_stats(outcome):
+            "one record per job set, however it ends"
+            if stats_file:
+                stats.fields['solved'] = outcome == Outcome.FEASIBLE
+                stats.fields['outcome'] = outcome.name
+                stats.write(stats_file)
+
         sched_name = os.path.join(odir, name + '-schedule.csv')
 
         allocations = None
-        # first, try inferring a schedule from a MILP solution
-        if opts.load_milp_sol:
+        known = None
+        # check if we have seen this job set before
+        if solve_cache and not opts.compare and not opts.min_cores:
+            known = solve_cache.lookup(*job_params(jobset.jobs), ncores)
+            if known and known.outcome == Outcome.INFEASIBLE:
+                print('%s: infeasible (cached).' % name)
+                write_stats(Outcome.INFEASIBLE)
+                continue
+            elif known and known.schedule:
+                print('%s: using cached schedule.' % name)
+                allocations = listed_solution(jobset.jobs, known.schedule)
+
+        # otherwise, try inferring a schedule from a MILP solution
+        # a solution of the folded MILP, if any, can be repeated every frame
+        if opts.load_milp_sol and opts.fold and not allocations and not opts.compare:
+            frame = next(fold.frames(jobset.taskset.tasks, ncores), None)
+            if frame:
+                sol_fname = os.path.join(opts.solutions_dir,
+                                         '%s-FOLD-%d.sol' % (name, frame))
+                if os.path.exists(sol_fname):
+                    folded = fold.fold(jobset, frame)
+                    for i, j in enumerate(folded.jobs):
+                        j.id = i
+                    folded_allocations = load_solution(
+                        sol_fname, milp_extra(opts, folded.jobs, ncores))
+                    if folded_allocations:
+                        placement = [(a.core, a.start) for a in folded_allocations]
+                        allocations = listed_solution(jobset.jobs,
+                                                      fold.unfold(folded, placement))
+
+        if opts.load_milp_sol and not allocations:
             sol_fname = os.path.join(opts.solutions_dir, name + '.sol')
             if os.path.exists(sol_fname):
-                allocations = load_solution(sol_fname)
+                allocations = load_solution(sol_fname, milp_extra(opts, jobset.jobs, ncores))
                 if opts.compare:
                     if allocations and not os.path.exists(sched_name):
                         print(name, 'solved by MILP solver')
                     continue
                 elif not allocations:
                     print('%s: infeasible.' % name)
+                    if solve_cache:
+                        solve_cache.store(*job_params(jobset.jobs), ncores,
+                                          Outcome.INFEASIBLE)
+                    if store:
+                        store.record(run, name, MILP, Outcome.INFEASIBLE,
+                                     jobs=len(jobset.jobs))
+                    write_stats(Outcome.INFEASIBLE)
                     continue
 
         if opts.compare:
@@ -174,52 +203,139 @@ def process(opts, fname):
                 print(name, 'solved by prior heuristics')
             continue
 
-        def run_heuristic():
-            print('Trying to schedule %s (%d jobs)...' % (name, len(jobset.jobs)))
-
-            if opts.decompose and jobset.is_dag:
-                decompose_limited_preemptive(jobset.jobs)
-
-            if opts.heuristic == 'backfill':
-                (unassigned, schedule, _) = dagfill.paf_meta_heuristic(jobset.jobs, ncores)
-            elif opts.heuristic == 'feasint':
-                (unassigned, schedule, _) = dagfeasint.paf_meta_heuristic(jobset.jobs, ncores)
-            else:
-                assert False
-
-            if opts.decompose and jobset.is_dag:
-                decompose_restore(jobset.jobs)
-
-            if not unassigned:
-                return heuristic_solution(schedule)
-            else:
-                return None
+        # set if propagation proves that the job set cannot be scheduled
+        infeasible = False
+
+        def run_heuristic(jobs, cores=None, reuse=None):
+            """reuse, if given, keeps what the heuristic computes
+            independently of the number of cores for later calls"""
+            nonlocal infeasible
+            if cores is None:
+                cores = ncores
+
+            print('Trying to schedule %s (%d jobs)...' % (name, len(jobs)))
+
+            result = schedule_jobset(jobs, cores, opts.heuristic,
+                                     decompose=bool(opts.decompose),
+                                     with_repair=opts.repair,
+                                     propagate=opts.propagate,
+                                     reduce=opts.reduce,
+                                     incremental=opts.incremental,
+                                     max_iterations=opts.max_iterations,
+                                     time_budget=opts.time_budget,
+                                     # validated below, whatever the source
+                                     check=False, reuse=reuse, stats=stats)
+            if result.outcome == Outcome.INFEASIBLE and jobs is jobset.jobs:
+                infeasible = True
+                print('%s: infeasible (propagation).' % name)
+                if solve_cache:
+                    solve_cache.store(*job_params(jobs), cores, Outcome.INFEASIBLE)
+            return result.allocations
+
+        def run_folded():
+            for frame in fold.frames(jobset.taskset.tasks, ncores):
+                with stats.phase('fold'):
+                    folded = fold.fold(jobset, frame)
+                    for i, j in enumerate(folded.jobs):
+                        j.id = i
+                print('%s: folding into a frame of %d instead of %d.' % (
+                    name, frame, jobset.taskset.hyperperiod))
+                allocations = run_heuristic(folded.jobs)
+                if allocations:
+                    stats.fields['frame'] = frame
+                    placement = [(a.core, a.start) for a in allocations]
+                    return listed_solution(jobset.jobs, fold.unfold(folded, placement))
+            # reservations are pessimistic, so fall back to the hyperperiod
+            return run_heuristic(jobset.jobs)
+
+        if opts.min_cores:
+            params = job_params(jobset.jobs)
+            asap = mincores.asap_placement(*params)
+            if not asap:
+                print('%s: infeasible on any number of cores.' % name)
+                if store:
+                    store.record(run, name, HEURISTIC, Outcome.INFEASIBLE,
+                                 jobs=len(jobset.jobs))
+                write_stats(Outcome.INFEASIBLE)
+                continue
+            lower = mincores.demand_bound(*params[:3])
+            upper, placement = asap
+            print('%s: searching for the fewest cores between %d and %d.' % (
+                name, lower, upper))
+            reuse = {}
+            def probe(m):
+                stats.count('probes')
+                return run_heuristic(jobset.jobs, m, reuse)
+            (m, allocations) = mincores.search(probe, lower, upper)
+            if m is None:
+                # starting every job as soon as possible works with upper cores
+                (m, allocations) = (upper, listed_solution(jobset.jobs, placement))
+            print('%s: %d cores suffice.' % (name, m))
+            stats.fields['cores'] = m
+            # for recording the schedule below
+            ncores = m
 
         if not allocations and opts.heuristic:
+            if opts.fold:
+                heuristic = run_folded
+            else:
+                heuristic = lambda: run_heuristic(jobset.jobs)
             if opts.profile:
                 with cProfile.Profile() as pr:
-                    allocations = run_heuristic()
+                    allocations = heuristic()
                 pr.print_stats('cumulative')
             else:
-                allocations = run_heuristic()
+                allocations = heuristic()
 
         if allocations:
-            validate(jobset.jobs, allocations)
+            with stats.phase('validate'):
+                validate(jobset.jobs, allocations)
+
+            if solve_cache and not (known and known.schedule):
+                solve_cache.store(*job_params(jobset.jobs), ncores,
+                                  Outcome.FEASIBLE,
+                                  [(a.core, a.start) for a in allocations])
 
             task_counter = defaultdict(int)
             for alloc in allocations:
                 task_counter[alloc.job.task.id] += 1
                 alloc.job.job_of_task = task_counter[alloc.job.task.id]
 
-            with open(sched_name, 'w') as f:
-                show(opts, allocations, file=f)
-            print('%s: solution stored in %s' % (name, sched_name))
+            with stats.phase('write'):
+                if store:
+                    store.record(run, name, HEURISTIC, Outcome.FEASIBLE,
+                                 jobs=len(jobset.jobs),
+                                 schedule=schedule_rows(allocations))
+                else:
+                    with open(sched_name, 'w') as f:
+                        show(opts, allocations, file=f)
+            print('%s: solution stored in %s' % (name, opts.db if store else sched_name))
+        elif infeasible:
+            if store:
+                with stats.phase('write'):
+                    store.record(run, name, HEURISTIC, Outcome.INFEASIBLE,
+                                 jobs=len(jobset.jobs))
         else:
             print('%s: no solution found.' % name)
-            if opts.log_failures:
-                f = open(sched_name.replace('.csv', '.nosol'), 'w')
-                f.write('no solution found')
-                f.close()
+            if store:
+                with stats.phase('write'):
+                    store.record(run, name, HEURISTIC, Outcome.UNSOLVED,
+                                 jobs=len(jobset.jobs))
+            elif opts.log_failures:
+                with stats.phase('write'):
+                    f = open(sched_name.replace('.csv', '.nosol'), 'w')
+                    f.write('no solution found')
+                    f.close()
+
+        if allocations:
+            write_stats(Outcome.FEASIBLE)
+        elif infeasible:
+            write_stats(Outcome.INFEASIBLE)
+        else:
+            write_stats(Outcome.UNSOLVED)
+
+    if stats_file:
+        stats_file.close()
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -247,8 +363,55 @@ def parse_args():
 
     parser.add_argument('--heuristic', default=None,
                         action='store',
-                        choices=['backfill', 'feasint'],
-                        help='run a scheduling heuristic')
+                        choices=['backfill', 'feasint', 'portfolio'],
+                        help='run a scheduling heuristic (portfolio: race '
+                             'all heuristics, with and without decomposition)')
+
+    parser.add_argument('--repair', default=False,
+                        action='store_true',
+                        help='try to fit jobs left over by the heuristic into '
+                             'the schedule with local search')
+
+    parser.add_argument('--incremental', default=False,
+                        action='store_true',
+                        help='rebuild only the part of the schedule affected '
+                             'by the new difficult jobs in every iteration of '
+                             'the heuristic (faster for backfill, but it '
+                             'solves slightly fewer job sets than rebuilding '
+                             'the whole schedule)')
+
+    parser.add_argument('--max-iterations', default=None,
+                        action='store', type=int, metavar='N',
+                        help='give up after N iterations of the heuristic')
+
+    parser.add_argument('--time-budget', default=None,
+                        action='store', type=float, metavar='SECONDS',
+                        help='give up once the heuristic has used up this '
+                             'much wall-clock time')
+
+    parser.add_argument('--fold', default=False,
+                        action='store_true',
+                        help='first try to schedule a pattern that repeats '
+                             'with a frame shorter than the hyperperiod, if '
+                             'the periods allow it')
+
+    parser.add_argument('--propagate', default=False,
+                        action='store_true',
+                        help='tighten the windows of the jobs by constraint '
+                             'propagation before running the heuristic')
+
+    parser.add_argument('--reduce', default=False,
+                        action='store_true',
+                        help='leave jobs whose windows overlap no other job '
+                             'to be placed at their release (with backfill '
+                             'and feasint, and when loading MILP solutions '
+                             'of mkILPs.py --reduce)')
+
+    parser.add_argument('--min-cores', default=False,
+                        action='store_true',
+                        help='search for the fewest cores on which the '
+                             'heuristic schedules each job set (ignores the '
+                             'number of cores of the file name and -m)')
 
     parser.add_argument('--decompose', default=None,
                         action='store_true',
@@ -266,17 +429,46 @@ def parse_args():
                         action='store_true',
                         help="run Python's cProfile profiler")
 
+    parser.add_argument('--stats', default=None,
+                        action='store', metavar='FILE',
+                        help='append per-job-set phase timings and counters '
+                             'to FILE (one JSON object per line)')
+
     parser.add_argument('-l', '--load-milp-sol', default=None,
                         action='store_true',
                         help='infer schedule from a *.sol file')
 
-    return parser.parse_args()
+    parser.add_argument('-c', '--cache', default=None,
+                        action='store', metavar='DIR',
+                        help='reuse (and record) known outcomes and schedules')
+
+    parser.add_argument('--db', default=None,
+                        action='store', metavar='FILE',
+                        help='record outcomes and schedules in the experiment '
+                             'store FILE instead of writing one file per job set')
+
+    opts = parser.parse_args()
+    if opts.min_cores and (opts.heuristic is None or opts.load_milp_sol or opts.compare):
+        parser.error('--min-cores needs --heuristic and excludes -l and --compare')
+    if opts.reduce and opts.heuristic == 'portfolio':
+        parser.error('--reduce does not work with --heuristic portfolio')
+    return opts
 
 def main():
     opts = parse_args()
 
-    for f in opts.input_files:
-        process(opts, f)
+    if opts.db:
+        with ExperimentStore(opts.db) as store:
+            run = store.start_run('schedule',
+                                  heuristic=opts.heuristic,
+                                  decompose=bool(opts.decompose),
+                                  repair=opts.repair,
+                                  load_milp_sol=bool(opts.load_milp_sol))
+            for f in opts.input_files:
+                process(opts, f, store, run)
+    else:
+        for f in opts.input_files:
+            process(opts, f)
 
 if __name__ == '__main__':
     main()
@@ -1,9 +1,10 @@
 import numpy as np, numpy.random
 from numpy.random import choice
 import random
-import header, csv, math
+import header, csv, math, argparse
 import result_logging as lg
 from itertools import combinations
+from functools import reduce
 
 '''randFixSum
 
@@ -93,9 +94,8 @@ def StaffordRandFixedSum(n, u, nsets):
     x[n - 1, ...] = sm + pr * s
 
     #iterated in fixed dimension order but needs to be randomised
-    #permute x row order within each column
-    for i in range(0, nsets):
-        x[..., i] = x[np.random.permutation(n), i]
+    #permute x row order within each column (all columns at once)
+    x = np.take_along_axis(x, np.argsort(np.random.uniform(size=(n, nsets)), axis=0), axis=0)
 
     return x.T.tolist()
 
@@ -170,16 +170,156 @@ def generateLogUniformPeriod(minRange, maxRange, basePeriod):
 	period = (math.floor(math.exp(ri)/float(basePeriod)) * basePeriod)
 	return period
 
+'''period list is gotten from automated motors benchmark 
+weighted choice as in benchmark Emberson et. al'''
+AM_PERIODS = [10,20,50,100,200,500,1000,2000,10000]
+AM_PERIODS_WEIGHTS = [0.03,0.02,0.02,0.25,0.25,0.03,0.20,0.01,0.04]
+'''add the angle synchronous tasks spread evenly among existing ones'''
+AM_PERIODS_WEIGHTS = [item + (15/float(900)) for item in AM_PERIODS_WEIGHTS]
+
+def hyperperiods(periods):
+    """exact hyperperiod of each row of an (nsets, ntasks) array of integer
+    periods"""
+    periods = np.asarray(periods, dtype=np.int64)
+    hyper = np.lcm.reduce(periods, axis=1)
+    # an int64 overflow would yield a "hyperperiod" that some period does not divide
+    assert np.all(hyper > 0) and np.all(hyper[:, None] % periods == 0)
+    return hyper
+
+def job_counts(periods, hyper):
+    "number of jobs in the hyperperiod of each row of periods"
+    return (hyper[:, None] // np.asarray(periods, dtype=np.int64)).sum(axis=1)
+
+class BoundedPeriodSampler:
+    """Draws automotive period vectors with at most max_jobs jobs in the
+    hyperperiod, one task at a time and without ever discarding a vector.
+
+    Let H be the lcm of all candidate periods. After some periods have been
+    drawn, all that matters is their hyperperiod h and s = sum(H / p), as the
+    job count is h * s / H. table[k][h][s] is the probability that k more
+    periods, drawn independently from the weights, keep the job count within
+    the bound. Drawing each period in proportion to its weight times that
+    probability yields exactly the distribution of drawing whole vectors and
+    rejecting those over the bound."""
+
+    def __init__(self, number_of_tasks, max_jobs=10000,
+                 periods=AM_PERIODS, weights=AM_PERIODS_WEIGHTS):
+        self.number_of_tasks = number_of_tasks
+        self.periods = list(periods)
+        self.weights = np.asarray(weights, dtype=float) / sum(weights)
+        H = reduce(header.lcm, self.periods)
+        self.units = [H // p for p in self.periods]
+
+        # all hyperperiods that some subset of the periods can have
+        hypers = {1}
+        while True:
+            more = hypers | set(header.lcm(h, p) for h in hypers for p in self.periods)
+            if more == hypers:
+                break
+            hypers = more
+
+        def size(h, k):
+            # s is bounded by the job count, and by what the
+            # number_of_tasks - k periods drawn so far can add up to
+            return min(max_jobs * H // h, (number_of_tasks - k) * max(self.units)) + 1
+
+        self.table = [dict((h, np.ones(size(h, 0))) for h in hypers)]
+        for k in range(1, number_of_tasks + 1):
+            prev = self.table[-1]
+            current = {}
+            for h in hypers:
+                f = np.zeros(size(h, k))
+                for p, u, w in zip(self.periods, self.units, self.weights):
+                    g = prev[header.lcm(h, p)]
+                    n = min(len(f), len(g) - u)
+                    if n > 0:
+                        f[:n] += w * g[u:u + n]
+                current[h] = f
+            self.table.append(current)
+
+        if not self.acceptance_rate() > 0:
+            raise ValueError('no %d periods have at most %d jobs in their hyperperiod'
+                             % (number_of_tasks, max_jobs))
+
+    def acceptance_rate(self):
+        "probability that a vector drawn without the bound respects it"
+        return self.table[self.number_of_tasks][1][0]
+
+    def sample(self):
+        h, s = 1, 0
+        drawn = []
+        for k in range(self.number_of_tasks, 0, -1):
+            remaining = self.table[k - 1]
+            likelihood = np.zeros(len(self.periods))
+            for i, (p, u) in enumerate(zip(self.periods, self.units)):
+                g = remaining[header.lcm(h, p)]
+                if s + u < len(g):
+                    likelihood[i] = self.weights[i] * g[s + u]
+            i = choice(len(self.periods), p=likelihood / likelihood.sum())
+            h, s = header.lcm(h, self.periods[i]), s + self.units[i]
+            drawn.append(self.periods[i])
+        return drawn
+
+    def sample_many(self, nsets):
+        return np.array([self.sample() for _ in range(nsets)], dtype=np.int64)
+
+def generateTaskSetBatch(nsets, number_of_tasks, total_utilisation, max_jobs=10000,
+                         sampler=None):
+    """draw nsets automotive task sets at once, discarding those with more than
+    max_jobs jobs in the hyperperiod; return arrays of periods, utilisations
+    and execution times, one row per task set
+
+    With a BoundedPeriodSampler (for number_of_tasks and max_jobs), periods
+    are drawn within the bound to begin with and nothing is discarded."""
+    if sampler:
+        # periods and utilisations are independent, so only the periods
+        # are subject to the bound
+        utilisations = np.asarray(gen_randfixedsum(nsets, total_utilisation, number_of_tasks))
+        periods = sampler.sample_many(nsets)
+        return periods, utilisations, periods * utilisations
+    periods = np.empty((0, number_of_tasks), dtype=np.int64)
+    utilisations = np.empty((0, number_of_tasks))
+    while len(periods) < nsets:
+        batch = max(2 * (nsets - len(periods)), 1000)
+        u = np.asarray(gen_randfixedsum(batch, total_utilisation, number_of_tasks))
+        p = choice(AM_PERIODS, size=(batch, number_of_tasks), p=AM_PERIODS_WEIGHTS)
+        accepted = job_counts(p, hyperperiods(p)) <= max_jobs
+        periods = np.concatenate((periods, p[accepted]))
+        utilisations = np.concatenate((utilisations, u[accepted]))
+    periods, utilisations = periods[:nsets], utilisations[:nsets]
+    return periods, utilisations, periods * utilisations
+
+def taskLists(periods, utilisations, ex_times):
+    "(number, period, utilisation, ex_time) tuples of each generated task set"
+    for row in zip(periods.tolist(), utilisations.tolist(), ex_times.tolist()):
+        yield list(zip(range(len(row[0])), *row))
+
+def periodDistributionReport(number_of_tasks, nsets=2000, max_jobs=10000):
+    "compare the bounded sampler's distribution with that of rejecting whole task sets"
+    sampler = BoundedPeriodSampler(number_of_tasks, max_jobs)
+    # (the utilisation does not matter for the periods)
+    rejection = generateTaskSetBatch(nsets, number_of_tasks, 1.0, max_jobs)[0]
+    bounded = sampler.sample_many(nsets)
+    print ("%d tasks, at most %d jobs, %d sets per sampler" % (number_of_tasks, max_jobs, nsets))
+    print ("acceptance rate of whole-set rejection: %.4f" % sampler.acceptance_rate())
+    print ("%10s %10s %10s" % ("period", "rejection", "bounded"))
+    for p in AM_PERIODS:
+        print ("%10d %10.4f %10.4f" % (p, np.mean(rejection == p), np.mean(bounded == p)))
+    print ("%10s %10s %10s" % ("jobs", "rejection", "bounded"))
+    jobs = [job_counts(periods, hyperperiods(periods)) for periods in (rejection, bounded)]
+    for q in [10, 25, 50, 75, 90, 100]:
+        print ("%9d%% %10d %10d" % (q, np.percentile(jobs[0], q), np.percentile(jobs[1], q)))
+    hypers = [hyperperiods(periods) for periods in (rejection, bounded)]
+    print ("%10s %10s %10s" % ("hyper", "rejection", "bounded"))
+    for h in sorted(set(hypers[0].tolist()) | set(hypers[1].tolist())):
+        print ("%10d %10.4f %10.4f" % (h, np.mean(hypers[0] == h), np.mean(hypers[1] == h)))
+
 ''' unit test'''
 def main(number_of_tasks, total_utilisation, distribution):
     '''define task set boundaries and properties'''
 
-    '''period list is gotten from automated motors benchmark 
-    weighted choice as in benchmark Emberson et. al'''
-    am_periods = [10,20,50,100,200,500,1000,2000,10000]
-    am_periods_weights = [0.03,0.02,0.02,0.25,0.25,0.03,0.20,0.01,0.04]
-    '''add the angle synchronous tasks spread evenly among existing ones'''
-    am_periods_weights = [item + (15/float(900)) for item in am_periods_weights]
+    am_periods = AM_PERIODS
+    am_periods_weights = AM_PERIODS_WEIGHTS
 
 
     '''utilisation is gotten from staffords rand fixed sum below'''
@@ -215,6 +355,15 @@ def uniNecTest(task_set):
     return True
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Task set generator")
+    parser.add_argument('--report', type=int, metavar='TASKS', default=None,
+                        help='compare the period distributions of the bounded '
+                        'sampler and of rejecting whole task sets for TASKS tasks')
+    opts = parser.parse_args()
+    if opts.report:
+        periodDistributionReport(opts.report)
+        raise SystemExit(0)
+
     '''number of tasks must not be > utilisation sum
     This algorithm protects against having tasks with utilisation > 1'''
     #uniprocessor generator
@@ -238,24 +387,22 @@ if __name__ == '__main__':
                 lg.log_results("uniprocessor_test", results)'''
     number_of_cores = 16
     number_of_tasks = 32
-    for i in range(300):
-        for total_utilisation_perc in range(1,11):
-            total_utilisation = (total_utilisation_perc/float(10)) * number_of_cores
-            print (number_of_tasks, "tasks with utilisation", total_utilisation)
-
-            task_set = main(number_of_tasks,total_utilisation,"automotive")
-            test_hyper_period = header.computeHyperperiod(task_set)
-            job_count = sum([test_hyper_period/task.period for task in task_set])
-
-            #to discard tasks sets with > 10000 jobs in hyper period
-            while job_count > 10000:
-                task_set = main(number_of_tasks,total_utilisation,"automotive")
-                test_hyper_period = header.computeHyperperiod(task_set)
-                job_count = sum([test_hyper_period/task.period for task in task_set])
-
-            task_list = [(task.number, task.period, task.utilisation, task.ex_time) for task in task_set]
-            results = [task_list, total_utilisation, total_utilisation_perc/float(10)]
-            lg.log_results("RTS 16 32", results)
+    number_of_sets = 300
+    levels = range(1,11)
+    task_lists = {}
+    #to discard tasks sets with > 10000 jobs in hyper period
+    sampler = BoundedPeriodSampler(number_of_tasks, max_jobs=10000)
+    for total_utilisation_perc in levels:
+        total_utilisation = (total_utilisation_perc/float(10)) * number_of_cores
+        print (number_of_sets, "sets of", number_of_tasks, "tasks with utilisation", total_utilisation)
+        batch = generateTaskSetBatch(number_of_sets, number_of_tasks, total_utilisation,
+                                     sampler=sampler)
+        task_lists[total_utilisation_perc] = list(taskLists(*batch))
+
+    #same row order as when generating one task set at a time
+    results = [[task_lists[perc][i], (perc/float(10)) * number_of_cores, perc/float(10)]
+               for i in range(number_of_sets) for perc in levels]
+    lg.log_many_results("RTS 16 32", results)
 
 
     '''task_list = main(10,5,"random")
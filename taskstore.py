@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import struct
+import sys
+
+from array import array
+
+import load
+from load import as_object
+
+MAGIC = b'TASKSTORE1\n'
+HEADER = struct.Struct('<Q')
+
+# per-task columns, in the order of the (id, period, util, wcet) tuples
+COLUMNS = ['id', 'period', 'utilization', 'wcet']
+
+def little_endian(values):
+    "convert between native and (stored) little-endian byte order, in place"
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values.byteswap()
+    return values
+
+def column_type(values):
+    "store integer columns as int64 (so they load as ints again), others as double"
+    return 'q' if all((type(v) is int for v in values)) else 'd'
+
+def write_store(fname, sources):
+    """collect the (non-DAG) task sets of the given CSV files into one
+    columnar store"""
+    sets = []
+    columns = dict((c, []) for c in COLUMNS)
+    offsets = [0]
+    for source in sources:
+        for index, ts in enumerate(load.tasksets(source)):
+            for t in ts.tasks:
+                assert not t.segments # only plain task sets can be stored
+                columns['id'].append(t.id)
+                columns['period'].append(t.period)
+                columns['utilization'].append(t.utilization)
+                columns['wcet'].append(t.wcet)
+            offsets.append(len(columns['id']))
+            sets.append({
+                'source'      : source,
+                'index'       : index,
+                'cores'       : load.cores_of(source),
+                'total_util'  : ts.total_util,
+                'perc_util'   : ts.perc_util,
+                'schedulable' : ts.schedulable,
+            })
+
+    data = [('offsets', array('q', offsets))]
+    for c in COLUMNS:
+        data.append((c, array(column_type(columns[c]), columns[c])))
+    layout = {}
+    position = 0
+    for name, values in data:
+        layout[name] = [values.typecode, position, len(values)]
+        position += len(values) * values.itemsize
+    header = json.dumps({'sets' : sets, 'columns' : layout}).encode('utf-8')
+
+    tmp = '%s.%d.tmp' % (fname, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(header)))
+        f.write(header)
+        for _, values in data:
+            little_endian(values).tofile(f)
+    os.replace(tmp, fname)
+    return len(sets)
+
+
+class TaskStore(object):
+    """Read access to a store written by write_store: the per-set metadata is
+    loaded up front, the tasks of a set only when it is requested."""
+
+    def __init__(self, fname):
+        self.fname = fname
+        with open(fname, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('%s is not a task-set store' % fname)
+            (size,) = HEADER.unpack(f.read(HEADER.size))
+            header = json.loads(f.read(size).decode('utf-8'))
+            self.data_start = f.tell()
+            self.sets = header['sets']
+            self.columns = header['columns']
+            self.offsets = self.read_column(f, 'offsets', 0, len(self.sets) + 1)
+
+    def __len__(self):
+        return len(self.sets)
+
+    def read_column(self, f, name, first, last):
+        "elements first..last-1 of a column"
+        typecode, position, _ = self.columns[name]
+        values = array(typecode)
+        f.seek(self.data_start + position + first * values.itemsize)
+        values.frombytes(f.read((last - first) * values.itemsize))
+        return little_endian(values)
+
+    def select(self, **criteria):
+        """indices of the task sets whose metadata matches all criteria, e.g.,
+        select(perc_util=90, schedulable=True)"""
+        return [i for i, meta in enumerate(self.sets)
+                if all((meta.get(k) == v for k, v in criteria.items()))]
+
+    def tasksets(self, indices=None):
+        "the given task sets (default: all), in the same form as load.tasksets"
+        if indices is None:
+            indices = range(len(self.sets))
+        with open(self.fname, 'rb') as f:
+            for i in indices:
+                first, last = self.offsets[i], self.offsets[i + 1]
+                cols = [self.read_column(f, c, first, last) for c in COLUMNS]
+                meta = self.sets[i]
+                # results are named after the source file, as for the file
+                # itself (the index in the store is 0-based)
+                yield as_object({
+                    'name'        : load.jobset_name(meta['source'], meta['index'] + 1),
+                    'cores'       : meta.get('cores', load.cores_of(meta['source'])),
+                    'tasks'       : [as_object({
+                        'id'          : id,
+                        'period'      : period,
+                        'utilization' : util,
+                        'wcet'        : wcet,
+                        'segments'    : False,
+                    }) for (id, period, util, wcet) in zip(*cols)],
+                    'total_util'  : meta['total_util'],
+                    'perc_util'   : meta['perc_util'],
+                    'schedulable' : meta['schedulable'],
+                })
+
+def main():
+    opts = parse_args()
+    count = write_store(opts.output, opts.input_files)
+    print('Stored %d task sets in %s.' % (count, opts.output))
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Collect task-set CSV files into one columnar store")
+
+    parser.add_argument('input_files', nargs='+',
+                        metavar='CSV-FILE',
+                        help='the task-set files to collect')
+
+    parser.add_argument('-o', '--output', default='tasksets' + load.STORE_SUFFIX,
+                        action='store', metavar='FILE',
+                        help='where to write the store')
+
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    main()